@@ -0,0 +1,204 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+'Benchmark CapSlide stages on synthetic templates and subtitle corpora'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# name -> (text boxes, table rows, table columns), every box and cell holds one placeholder
+TEMPLATES = {
+    'textboxes': (4, 0, 0),
+    'table': (0, 4, 2),
+    'wide': (10, 6, 5),
+}
+ENGINES = ('pptx', 'streaming')
+
+def create_template(path, text_boxes, table_rows, table_columns):
+    """Write a template whose last slide is a Blank slide full of placeholders, return the placeholder names"""
+    from pptx import Presentation
+    from pptx.util import Inches
+
+    pptx = Presentation()
+    slide = pptx.slides.add_slide(pptx.slide_layouts.get_by_name('Blank'))
+    names = []
+    for i in range(text_boxes):
+        text_box = slide.shapes.add_textbox(Inches(0.5), Inches(0.3 + i * 0.4), Inches(9), Inches(0.4))
+        names.append(f'text{i}')
+        text_box.text_frame.text = f'#text{i}#'
+    if table_rows and table_columns:
+        table = slide.shapes.add_table(table_rows, table_columns, Inches(0.5), Inches(4), Inches(9), Inches(3)).table
+        for row in range(table_rows):
+            for column in range(table_columns):
+                names.append(f'cell{row}_{column}')
+                table.cell(row, column).text = f'#cell{row}_{column}#'
+    pptx.save(path)
+    return names
+
+
+def create_subtitles(path, names, rows_count):
+    """Write an NDJSON corpus of rows_count rows filling every placeholder"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(rows_count):
+            row = {name: f'字幕 {i} line for {name}' for name in names}
+            f.write(json.dumps(row, ensure_ascii=False))
+            f.write('\n')
+
+
+def get_peak_rss_kb():
+    """Peak resident set size of this process in KB, ru_maxrss being in bytes on macOS and in KB elsewhere"""
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss // 1024 if sys.platform == 'darwin' else peak_rss
+
+
+def run_case(template_path, subtitles_path, output_path, engine, options):
+    """
+    Generate a deck through append_slides_with_rows as the command line does and return the stage timers
+    of the processor, executed in its own process so the peak RSS is its own.
+    options are more SubtitlesProcessor arguments, e.g. workers or autofit.
+    """
+    from capslide import SubtitlesProcessor
+    from capslide.utils import iter_json_rows
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        processor = SubtitlesProcessor(
+            output_path=output_path,
+            template_path=template_path,
+            streaming=(engine == 'streaming'),
+            progress_interval=None,
+            **options
+        )
+        with open(subtitles_path, 'r', encoding='utf-8') as f:
+            processor.append_slides_with_rows(iter_json_rows(f))
+        processor.save()
+        total = time.perf_counter() - start
+
+    stats = processor.stats.as_dict()
+    stages = {stage: timer['seconds'] for stage, timer in stats['timers'].items()}
+    stages['total'] = total
+    output_bytes = 0
+    for path in processor.output_paths:
+        output_bytes += os.path.getsize(path)
+        os.remove(path)
+    return {
+        'rows': stats['counters'].get('rows', 0),
+        'stages': stages,
+        'counters': stats['counters'],
+        'peak_rss_kb': get_peak_rss_kb(),
+        'output_bytes': output_bytes,
+    }
+
+
+def get_case_name(template_name, rows_count, engine, options):
+    """Name of a case in the results and baselines, options other than the defaults are part of it"""
+    name = f'{template_name}/{rows_count}/{engine}'
+    if options.get('workers', 1) > 1:
+        name += f'/workers{options["workers"]}'
+    if options.get('autofit'):
+        name += '/autofit'
+    if options.get('max_slides_per_file'):
+        name += f'/split{options["max_slides_per_file"]}'
+    return name
+
+
+def run_benchmarks(templates, sizes, engines, work_dir, options=None):
+    results = []
+    for template_name in templates:
+        template_path = os.path.join(work_dir, f'{template_name}.pptx')
+        names = create_template(template_path, *TEMPLATES[template_name])
+        for rows_count in sizes:
+            subtitles_path = os.path.join(work_dir, f'{template_name}-{rows_count}.ndjson')
+            create_subtitles(subtitles_path, names, rows_count)
+            for engine in engines:
+                name = get_case_name(template_name, rows_count, engine, options or {})
+                output_path = os.path.join(work_dir, f'{template_name}-{rows_count}-{engine}.pptx')
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    result = executor.submit(run_case, template_path, subtitles_path, output_path, engine, options or {}).result()
+                result.update(name=name, template=template_name, placeholders=len(names), engine=engine, options=options or {})
+                results.append(result)
+                stages = ', '.join(f'{stage} {seconds:.3f}s' for stage, seconds in result['stages'].items())
+                print(f'{name}: {stages}, peak RSS {result["peak_rss_kb"] // 1024} MB')
+            os.remove(subtitles_path)
+    return results
+
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Return the (case, stage, baseline, current) tuples slower than the baseline beyond the tolerance"""
+    baseline_cases = {case['name']: case for case in baseline['cases']}
+    regressions = []
+    for case in results:
+        baseline_case = baseline_cases.get(case['name'])
+        if baseline_case is None:
+            continue
+        for stage, seconds in case['stages'].items():
+            baseline_seconds = baseline_case['stages'].get(stage)
+            # Very short stages are dominated by noise
+            if baseline_seconds is None or max(seconds, baseline_seconds) < 0.05:
+                continue
+            if seconds > baseline_seconds * (1 + tolerance):
+                regressions.append((case['name'], stage, baseline_seconds, seconds))
+        baseline_rss = baseline_case.get('peak_rss_kb')
+        if baseline_rss and case['peak_rss_kb'] > baseline_rss * (1 + tolerance):
+            regressions.append((case['name'], 'peak_rss_kb', baseline_rss, case['peak_rss_kb']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark CapSlide stages on synthetic templates and subtitle corpora.")
+    parser.add_argument("--templates", help="Comma separated synthetic templates (default: all).", default=','.join(TEMPLATES))
+    parser.add_argument("--sizes", help="Comma separated row counts (default: 1000,10000).", default="1000,10000")
+    parser.add_argument("--engines", help="Comma separated output engines (default: pptx,streaming).", default=','.join(ENGINES))
+    parser.add_argument("-w", "--workers", help="Worker processes generating slides (default: 1).", default=1, type=int)
+    parser.add_argument("--autofit", help="Fit the filled subtitles into their boxes.", action="store_true")
+    parser.add_argument("--max_slides_per_file", help="Split the outputs into files of at most N slides.", default=None, type=int)
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file.", default=None)
+    parser.add_argument("-b", "--baseline", help="Compare with a JSON baseline and fail on regressions.", default=None)
+    parser.add_argument("--tolerance", help="Allowed slowdown against the baseline (default: 0.2).", default=0.2, type=float)
+    args = parser.parse_args(argv)
+
+    templates = args.templates.split(',')
+    engines = args.engines.split(',')
+    unknown = [name for name in templates if name not in TEMPLATES] + [name for name in engines if name not in ENGINES]
+    if unknown:
+        parser.error(f"Unknown template or engine: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        options = dict(workers=args.workers, autofit=args.autofit, max_slides_per_file=args.max_slides_per_file)
+        results = run_benchmarks(templates, sizes, engines, work_dir, options)
+
+    import pptx
+    report = {
+        'python': platform.python_version(),
+        'python_pptx': pptx.__version__,
+        'platform': platform.platform(),
+        'rss_unit': 'KB',
+        'cases': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f'Results written to {args.output}')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(results, baseline, args.tolerance)
+        for name, stage, baseline_value, value in regressions:
+            print(f'Regression: {name} {stage} {baseline_value:.3f} -> {value:.3f}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against the baseline.')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,23 @@
-from .core import (
-    SubtitlesProcessor,
-    CapSlideError,
-    PowerPointTemplateError,
-    PowerPointTemplateNotFoundError,
-    SubtitlesTemplateSlideMasterError,
-    SubtitlesTemplateSlideIndexError,
-    SubtitlesTemplatePlaceholderError
-)
\ No newline at end of file
+'CapSlide: auto-fill subtitles into PPT'
+
+# Names imported from core on first access, so importing the package (e.g. for the CLI)
+# does not load python-pptx and lxml until a deck is actually generated
+__all__ = [
+    'SubtitlesProcessor',
+    'CapSlideError',
+    'PowerPointTemplateError',
+    'PowerPointTemplateNotFoundError',
+    'SubtitlesTemplateSlideMasterError',
+    'SubtitlesTemplateSlideIndexError',
+    'SubtitlesTemplatePlaceholderError',
+]
+
+def __getattr__(name):
+    if name in __all__:
+        from . import core
+        return getattr(core, name)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+from .stats import ProgressReporter
+
+'Fill slides from an async stream of rows, e.g. a live captioning feed'
+
+# Put in the queue once the row source is exhausted
+_END = object()
+
+async def append_slides_from_async_rows(processor, rows, queue_size=64, batch_size=32,
+                                        checkpoint_interval=None, checkpoint_path=None):
+    """
+    Add a slide for every row of an async iterator as rows arrive.
+    Rows wait in a queue of queue_size rows: once it is full the source is not read further
+    until slides catch up, so a fast feed cannot grow memory without bounds.
+    Slides are filled on a single worker thread, up to batch_size queued rows at a time,
+    which keeps the event loop responsive and the deck touched by one thread only.
+    Every checkpoint_interval seconds the deck is saved to checkpoint_path on that same thread,
+    see SubtitlesProcessor.save_checkpoint.
+    Return (number of inserted subtitles, number of added pages) like append_slides_with_rows.
+    """
+    # Rows taken from a live feed cannot be read again, so the run fails before reading any
+    if checkpoint_interval is not None:
+        processor.get_checkpoint_path(checkpoint_path)
+
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(maxsize=queue_size)
+    progress = ProgressReporter(processor.progress_interval) if processor.progress_interval is not None else None
+    total_matched_count = 0
+    page_count = 0
+
+    def fill_slides(batch):
+        nonlocal total_matched_count, page_count
+        for row in batch:
+            matched_count = processor.append_slide_with_row(row)
+            processor.stats.count('rows')
+            if matched_count > 0:
+                page_count += 1
+                total_matched_count += matched_count
+                if progress is not None:
+                    progress.update(page_count, total_matched_count, matched_count)
+
+    stopped = False
+    async def produce():
+        try:
+            async for row in rows:
+                await queue.put(row)
+        finally:
+            # Nobody takes from the queue anymore once the slides failed
+            if not stopped:
+                await queue.put(_END)
+
+    async def consume(executor):
+        last_checkpoint = loop.time()
+        ended = False
+        while not ended:
+            batch = [await queue.get()]
+            while len(batch) < batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            if batch[-1] is _END:
+                batch.pop()
+                ended = True
+            if batch:
+                await loop.run_in_executor(executor, fill_slides, batch)
+            if checkpoint_interval is not None and not ended and loop.time() - last_checkpoint >= checkpoint_interval:
+                await loop.run_in_executor(executor, processor.save_checkpoint, checkpoint_path)
+                last_checkpoint = loop.time()
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    producer = asyncio.ensure_future(produce())
+    try:
+        await consume(executor)
+    except BaseException:
+        stopped = True
+        producer.cancel()
+        raise
+    finally:
+        executor.shutdown(wait=False)
+    # Raises the error of the row source, if any
+    await producer
+
+    processor.stats.count('pages', page_count)
+    processor.stats.count('placeholders', total_matched_count)
+    return total_matched_count, page_count
@@ -0,0 +1,208 @@
+from collections import namedtuple
+from functools import lru_cache
+import math
+import unicodedata
+from pptx.enum.shapes import PP_PLACEHOLDER
+from pptx.oxml.ns import qn
+from pptx.util import Centipoints, Pt
+
+'Font sizes fitting subtitles into their boxes, from cached glyph widths'
+
+MIN_FONT_SIZE = Pt(8)
+LINE_SPACING = 1.2
+# Glyphs are measured once at this size in points, widths scale linearly with the size
+REFERENCE_SIZE = 100
+
+# Estimated widths in em, for fonts PIL cannot measure
+NARROW_CHARS = frozenset(' .,;:!|\'"`()[]{}ijltfrI')
+WIDE_CHARS = frozenset('mwMW@%')
+
+def estimate_char_width(char):
+    """Width of a character in em for a typical proportional font, CJK characters being square"""
+    if unicodedata.east_asian_width(char) in ('W', 'F'):
+        return 1.0
+    if char in NARROW_CHARS:
+        return 0.3
+    if char in WIDE_CHARS:
+        return 0.85
+    if char.isupper() or char.isdigit():
+        return 0.62
+    return 0.52
+
+
+class GlyphWidths:
+    """Widths of characters in em, measured with a PIL font when one is given, estimated otherwise"""
+    def __init__(self, font=None) -> None:
+        self.font = font
+        self.widths = {}
+
+    def char_width(self, char):
+        width = self.widths.get(char)
+        if width is None:
+            if self.font is not None:
+                width = self.font.getlength(char) / REFERENCE_SIZE
+            else:
+                width = estimate_char_width(char)
+            self.widths[char] = width
+        return width
+
+    def measure(self, text):
+        """Width of a line of text in em"""
+        widths = self.widths
+        return sum(widths[char] if char in widths else self.char_width(char) for char in text)
+
+
+@lru_cache(maxsize=None)
+def get_glyph_widths(font_name=None, font_file=None):
+    """
+    The glyph widths table of a font, created once per font.
+    font_file is measured with PIL, otherwise the font file of font_name if python-pptx can find it;
+    without PIL or a font file, widths are estimated.
+    """
+    try:
+        from PIL import ImageFont
+    except ImportError:
+        return GlyphWidths()
+
+    if font_file is None and font_name is not None:
+        from pptx.text.fonts import FontFiles
+        try:
+            font_file = FontFiles.find(font_name, False, False)
+        except (KeyError, OSError):
+            pass
+    if font_file is None:
+        return GlyphWidths()
+    try:
+        return GlyphWidths(ImageFont.truetype(font_file, REFERENCE_SIZE))
+    except OSError:
+        return GlyphWidths()
+
+
+def get_list_style_size(list_style, level):
+    """Font size a list style (a:lstStyle, a:defaultTextStyle or p:txStyles) sets for a paragraph level, None when unset"""
+    if list_style is None:
+        return None
+    level_properties = list_style.find(qn(f'a:lvl{level + 1}pPr'))
+    return get_default_run_size(level_properties)
+
+
+def get_default_run_size(paragraph_properties):
+    """Font size of the a:defRPr of paragraph properties, None when unset"""
+    if paragraph_properties is None:
+        return None
+    default_run_properties = paragraph_properties.find(qn('a:defRPr'))
+    if default_run_properties is None or default_run_properties.get('sz') is None:
+        return None
+    return Centipoints(int(default_run_properties.get('sz')))
+
+
+def get_effective_font_size(run, paragraph, text_frame, owner):
+    """
+    The font size a run is shown at: its own, or the one it inherits from its paragraph and the
+    list style of its text frame, then for placeholders from the layout and master placeholders
+    and the text styles of the master, for other shapes and table cells (owner) from the default
+    text style of the presentation. None when nothing sets it.
+    """
+    if run.font.size is not None:
+        return run.font.size
+    level = paragraph.level
+    size = get_default_run_size(paragraph._p.pPr) or get_list_style_size(text_frame._txBody.find(qn('a:lstStyle')), level)
+    if size is not None:
+        return size
+
+    if getattr(owner, 'is_placeholder', False):
+        placeholder = owner._base_placeholder
+        while placeholder is not None and size is None:
+            if placeholder.has_text_frame:
+                size = get_list_style_size(placeholder.text_frame._txBody.find(qn('a:lstStyle')), level)
+            placeholder = getattr(placeholder, '_base_placeholder', None)
+        if size is None:
+            text_styles = owner.part.slide_layout.slide_master._element.find(qn('p:txStyles'))
+            if text_styles is not None:
+                is_title = owner.placeholder_format.type in (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE)
+                size = get_list_style_size(text_styles.find(qn('p:titleStyle' if is_title else 'p:bodyStyle')), level)
+        return size
+
+    presentation = owner.part.package.presentation_part._element
+    return get_list_style_size(presentation.find(qn('p:defaultTextStyle')), level)
+
+
+# What a run is fitted into: its font and the inner size of its text box or table cell in EMU
+FitTarget = namedtuple('FitTarget', ['font_name', 'max_size', 'width', 'height'])
+
+def get_fit_target(run, paragraph, owner, box):
+    """
+    The FitTarget of a run of a shape or table cell (owner) within a box of (width, height),
+    without the margins of its text frame or cell; None when the box size is inherited from a layout
+    or the font size cannot be resolved, such runs are left as they are
+    """
+    width, height = box
+    if width is None or height is None:
+        return None
+    # Table cells hold their own margins, shapes hold them in their text frame
+    text_frame = owner.text_frame
+    margins = owner if hasattr(owner, 'margin_left') else text_frame
+    max_size = get_effective_font_size(run, paragraph, text_frame, owner)
+    if max_size is None:
+        return None
+    return FitTarget(
+        run.font.name,
+        max_size,
+        width - margins.margin_left - margins.margin_right,
+        height - margins.margin_top - margins.margin_bottom
+    )
+
+
+def get_fit_targets(slide, placeholder_index):
+    """The FitTarget of every run of the placeholder index of a template slide, in the order of its runs"""
+    shapes = list(slide.shapes)
+    targets = []
+    for run in placeholder_index.runs:
+        location = run.locations[0]
+        shape = shapes[location.shape_index]
+        if location.cell is None:
+            owner = shape
+            box = (shape.width, shape.height)
+        else:
+            row_index, column_index = location.cell
+            table = shape.table
+            owner = table.cell(row_index, column_index)
+            box = (table.columns[column_index].width, table.rows[row_index].height)
+        paragraph = owner.text_frame.paragraphs[location.paragraph_index]
+        targets.append(get_fit_target(paragraph.runs[location.run_index], paragraph, owner, box))
+    return targets
+
+
+class TextFitter:
+    """
+    Finds the largest font size, in whole points from the size of the run down to min_size,
+    at which a text wrapped into its FitTarget stays within it.
+    Sizes are memoized per text and target, subtitles and boxes repeat a lot.
+    """
+    def __init__(self, font_file=None, min_size=MIN_FONT_SIZE, cache_size=4096) -> None:
+        self.font_file = font_file
+        self.min_size = min_size
+        self.fit = lru_cache(maxsize=cache_size)(self._fit)
+
+    def _fit(self, text, target):
+        font_name, max_size, width, height = target
+        glyph_widths = get_glyph_widths(font_name, self.font_file)
+        line_widths = [glyph_widths.measure(line) for line in text.split('\n')]
+
+        def fits(points):
+            size = Pt(points)
+            # Lines wrap once their width reaches the box width
+            lines_count = sum(max(1, -(-int(line_width * size) // width)) for line_width in line_widths)
+            return lines_count * size * LINE_SPACING <= height
+
+        low, high = int(self.min_size.pt), math.ceil(max_size.pt)
+        if width <= 0 or height <= 0 or high <= low or fits(max_size.pt):
+            return max_size
+        # The largest fitting size is within [low, high), the minimum size being used when nothing fits
+        while high - low > 1:
+            middle = (low + high) // 2
+            if fits(middle):
+                low = middle
+            else:
+                high = middle
+        return Pt(low)
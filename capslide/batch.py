@@ -0,0 +1,98 @@
+from collections import Counter
+import glob
+import os.path
+from preprocessors import get_reader
+
+'Render many subtitle files against one template'
+
+MANIFEST_FILE_EXTENSION = '.lst'
+
+def iter_subtitle_files(source):
+    """
+    Expand a batch source into subtitle file paths.
+    source can be a directory, a glob pattern, a manifest (.lst, one path per line) or a single file.
+    """
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if os.path.isfile(path) and get_reader(name) is not None:
+                yield path
+    elif source.endswith(MANIFEST_FILE_EXTENSION):
+        # Relative entries are relative to the manifest itself
+        base_dir = os.path.dirname(source)
+        with open(source, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#'):
+                    yield os.path.join(base_dir, line)
+    elif glob.has_magic(source):
+        yield from sorted(glob.glob(source))
+    else:
+        yield source
+
+
+def get_batch_output_path(subtitle_file_path, output_dir):
+    """Output deck of a subtitle file, named after it"""
+    name = os.path.splitext(os.path.basename(subtitle_file_path))[0]
+    return os.path.join(output_dir, f'{name}.pptx')
+
+
+def get_batch_output_paths(subtitle_file_paths, output_dir):
+    """
+    Output decks of absolute subtitle file paths, one distinct path each.
+    Files are named after their stem; files sharing a stem keep their extension (ep1.srt.pptx),
+    and files sharing a name in different directories are placed in the directories
+    they have below the directory all of them share (season1/ep1.srt.pptx).
+    Names are compared regardless of case, which some file systems ignore.
+    """
+    def get_colliding(names):
+        counts = Counter(name.lower() for name in names)
+        return [counts[name.lower()] > 1 for name in names]
+
+    names = [os.path.basename(path) for path in subtitle_file_paths]
+    stem_collisions = get_colliding([os.path.splitext(name)[0] for name in names])
+    name_collisions = get_colliding(names)
+    colliding_paths = [path for path, colliding in zip(subtitle_file_paths, name_collisions) if colliding]
+    common_dir = os.path.commonpath([os.path.dirname(path) for path in colliding_paths]) if colliding_paths else None
+
+    output_paths = []
+    for path, name, stem_colliding, name_colliding in zip(subtitle_file_paths, names, stem_collisions, name_collisions):
+        if name_colliding:
+            output_paths.append(os.path.join(output_dir, f'{os.path.relpath(path, common_dir)}.pptx'))
+        elif stem_colliding:
+            output_paths.append(os.path.join(output_dir, f'{name}.pptx'))
+        else:
+            output_paths.append(get_batch_output_path(path, output_dir))
+    return output_paths
+
+
+def render_batch(processor, sources, output_dir):
+    """
+    Render one deck per subtitle file with a validated processor.
+    Each output starts from an in-memory copy of the template (see SubtitlesProcessor.spawn).
+    Returns a list of (subtitle file, output file, matched count, slides count, error) tuples.
+    """
+    output_dir = os.path.abspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Every file is listed before rendering, so no two outputs share a name; files listed twice are rendered once
+    subtitle_file_paths = list(dict.fromkeys(
+        os.path.abspath(subtitle_file_path) for source in sources for subtitle_file_path in iter_subtitle_files(source)
+    ))
+    output_paths = get_batch_output_paths(subtitle_file_paths, output_dir)
+
+    results = []
+    for subtitle_file_path, output_path in zip(subtitle_file_paths, output_paths):
+        job = processor.spawn(output_path)
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            matched_count, slides_count = job.append_slides_from_file(subtitle_file_path)
+            job.save()
+        except Exception as e:
+            print(f'Error: Failed to process {subtitle_file_path}: {e}')
+            results.append((subtitle_file_path, output_path, 0, 0, e))
+        else:
+            results.append((subtitle_file_path, output_path, matched_count, slides_count, None))
+        # The numbers of every job add up in the stats of the batch processor
+        processor.stats.merge(job.stats)
+    return results
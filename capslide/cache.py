@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import time
+from .placeholders import PLACEHOLDER_PATTERN
+
+'On-disk cache of validated template slides'
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'capslide')
+
+# Bumped whenever the layout or the meaning of an entry changes, older entries are then never read again
+CACHE_FORMAT_VERSION = 2
+
+def get_index_fingerprint():
+    """Short hash of the placeholder token pattern, cached placeholder indexes hold the tokens it matched"""
+    return hashlib.sha256(PLACEHOLDER_PATTERN.pattern.encode('utf-8')).hexdigest()[:12]
+
+
+class TemplateCache:
+    """
+    Validated template slides stored on disk, keyed by the content hash of the template and the slide number.
+    An entry holds the layout check result, the placeholder index and the prepared slide prototype,
+    so repeated jobs against an unchanged template skip validation.
+    Entries unused for max_age seconds are evicted, then the least recently used ones until the
+    cache fits in max_size bytes.
+    """
+    def __init__(self, cache_dir=None, max_size=64 * 1024 * 1024, max_age=30 * 24 * 3600) -> None:
+        if cache_dir is None:
+            cache_dir = os.environ.get('CAPSLIDE_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        self.max_age = max_age
+
+    def get_key(self, template_bytes, slide_page_number):
+        # Entries indexed with another placeholder pattern are never reused
+        return f'{hashlib.sha256(template_bytes).hexdigest()}-{slide_page_number}-v{CACHE_FORMAT_VERSION}-{get_index_fingerprint()}'
+
+    def get_entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, key):
+        """Return the cached entry or None"""
+        path = self.get_entry_path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.max_age:
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # The modification time tracks the last use of an entry
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return entry
+
+    def put(self, key, entry):
+        """Store an entry, then evict what no longer fits"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_entry_path(key)
+        # Write to a temporary file first so concurrent jobs never read a partial entry
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        self.evict()
+
+    def evict(self):
+        """Remove expired entries and the least recently used ones beyond max_size"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = 0
+        for mtime, size, path in sorted(entries, reverse=True):
+            if now - mtime <= self.max_age and total_size + size <= self.max_size:
+                total_size += size
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every entry"""
+        if os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.cache_dir, name))
@@ -1,59 +1,111 @@
 import argparse
+import contextlib
+import json
 import sys
 import os
-from .core import SubtitlesProcessor 
 
-def main():
-    parser = argparse.ArgumentParser(
-        description="CapSlide: A tool to convert subtitles (.json/.txt) into professional PPT slides."
-    )
-    
-    # 1. Positional Argument
-    parser.add_argument("subtitles", help="Path to the input subtitle file (.json/.txt).")
-    
-    # 2. Required Arguments
+# python-pptx is only imported by the commands generating decks, see create_processor
+
+def add_template_arguments(parser):
+    """Arguments shared by every command that renders decks from a template"""
+    # Required Arguments
     parser.add_argument("-t", "--template", help="Path to the template PPTX file.", required=True)
-    
-    # 3. Optional Arguments
-    parser.add_argument("-o", "--output", help="Path for the generated PPTX file (default: output.pptx).", default="output.pptx")
+
+    # Optional Arguments
     parser.add_argument("-p", "--placeholder", help="The text placeholder in the template to be replaced.", default="subtitle")
-    parser.add_argument("-n", "--template_slide_page_number", 
-                        help="Slide page number to use (1-based). Use 0 for the last slide (default: 0).", 
+    parser.add_argument("-n", "--template_slide_page_number",
+                        help="Slide page number to use (1-based). Use 0 for the last slide (default: 0).",
                         default=0, type=int)
-    
+
     parser.add_argument("-i", "--ignore_marks", help="Exclude punctuation marks from the slides.", action="store_true")
+    parser.add_argument("--half_width", help="Convert full-width letters, digits, marks and spaces to half-width.", action="store_true")
+    parser.add_argument("--collapse_whitespace", help="Trim subtitles and collapse runs of whitespace into one space.", action="store_true")
+    parser.add_argument("--max_length", help="Truncate subtitles longer than this many characters, ending them with an ellipsis.", default=None, type=int)
+    parser.add_argument("--autofit", help="Shrink the font of filled subtitles until they fit their text box or table cell.", action="store_true")
+    parser.add_argument("--font_file", help="TrueType font measuring the text with --autofit (default: estimated glyph widths).", default=None)
     parser.add_argument("-v", "--verbose", help="Display detailed processing logs.", action="store_true")
-    
-    args = parser.parse_args()
+    parser.add_argument("-s", "--streaming", help="Write slides straight into the output file as they are generated, keeping memory flat for very large decks.", action="store_true")
+    parser.add_argument("-w", "--workers", help="Number of worker processes generating slides in parallel (default: 1).", default=1, type=int)
+    parser.add_argument("-c", "--cache_dir", help="Directory caching validated templates between runs (disabled by default).", default=None)
+    parser.add_argument("--incremental", help="Reuse the slides of unchanged rows from the previous output, tracked in a sidecar manifest (implies --streaming).", action="store_true")
+    parser.add_argument("--prune", help="Keep only the generated slides, dropping the template slides and the layouts, images and notes only they use.", action="store_true")
+    parser.add_argument("--max_slides_per_file", help="Split the output into files of at most N generated slides, named like output_001.pptx.", default=None, type=int)
+    parser.add_argument("--compression", help="Compression of the output zip, stored is fastest for scratch outputs (default: deflate).", choices=["deflate", "stored"], default="deflate")
+    parser.add_argument("--compress_level", help="Deflate level from 1 (fastest) to 9 (smallest) (default: 6).", default=6, type=int)
+    parser.add_argument("--save_workers", help="Number of threads compressing the output parts (default: up to 4).", default=None, type=int)
+    parser.add_argument("--stats", help="Write the stage timers and counters in this format once done.", choices=["json"], default=None)
+    parser.add_argument("--stats_output", help="File the stats are written to (default: standard output).", default=None)
+
+
+def check_template_arguments(parser, args):
+    """Reject template argument values that would only fail once the slides are generated"""
+    if args.max_slides_per_file is not None and args.max_slides_per_file < 1:
+        parser.error("--max_slides_per_file must be at least 1.")
+    if args.compress_level != -1 and not 0 <= args.compress_level <= 9:
+        parser.error("--compress_level must be from 0 to 9, or -1 for the zlib default.")
+
+
+def create_processor(args, output_path):
+    """Initialize a processor from the template arguments"""
+    from .core import SubtitlesProcessor
+
+    return SubtitlesProcessor(
+        output_path=output_path,
+        template_path=args.template,
+        template_slide_page_number=args.template_slide_page_number,
+        placeholder=args.placeholder,
+        ignore_masks=args.ignore_marks,
+        half_width=args.half_width,
+        collapse_whitespace=args.collapse_whitespace,
+        max_length=args.max_length,
+        autofit=args.autofit,
+        font_file=args.font_file,
+        verbose=args.verbose,
+        streaming=args.streaming,
+        workers=args.workers,
+        cache_dir=args.cache_dir,
+        incremental=args.incremental,
+        prune=args.prune,
+        compression=args.compression,
+        compress_level=args.compress_level,
+        save_workers=args.save_workers,
+        max_slides_per_file=args.max_slides_per_file
+    )
+
+
+def write_stats(args, processor):
+    """Write the stats of a processor as requested by --stats"""
+    if args.stats is None:
+        return
+    stats = processor.stats.to_json()
+    if args.stats_output:
+        with open(args.stats_output, "w", encoding="utf-8") as f:
+            f.write(stats)
+    else:
+        print(stats)
+
+
+def batch_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="capslide batch",
+        description="CapSlide: Render many subtitle files against one template, loaded and validated once."
+    )
+    parser.add_argument("sources", nargs="+", help="Subtitle files, directories, glob patterns or .lst manifests (one path per line).")
+    add_template_arguments(parser)
+    parser.add_argument("-o", "--output", help="Directory for the generated PPTX files (default: outputs).", default="outputs")
+
+    args = parser.parse_args(argv)
+    check_template_arguments(parser, args)
 
-    # --- Robustness Checks ---
-    if not os.path.exists(args.input):
-        print(f"Error: Input file '{args.input}' not found.")
-        sys.exit(1)
-    
     if not os.path.exists(args.template):
         print(f"Error: Template file '{args.template}' not found.")
         sys.exit(1)
 
-    try:
-        # Initializing the processor
-        processor = SubtitlesProcessor(
-            output_path=args.output,
-            template_path=args.template,
-            template_slide_page_number=args.template_slide_page_number,
-            placeholder=args.placeholder, 
-            ignore_masks=args.ignore_marks,
-            verbose=args.verbose
-        )
-        
-        print(f"Status: Processing '{args.subtitles}'...")
-        
-        # 4. Trigger actual processing logic
-        # Assuming the method is named 'process' or 'run'
-        processor.append_slides_from_file(args.subtitles)
-        
-        print(f"Success: PPT generated at '{args.outsubtitlesput}'")
+    from .batch import render_batch
 
+    try:
+        processor = create_processor(args, os.path.join(os.path.abspath(args.output), "output.pptx"))
+        results = render_batch(processor, args.sources, args.output)
     except Exception as e:
         print(f"An error occurred during processing: {e}")
         if args.verbose:
@@ -61,5 +113,171 @@ def main():
             traceback.print_exc()
         sys.exit(1)
 
+    failed = [result for result in results if result[-1] is not None]
+    print(f"Success: {len(results) - len(failed)} of {len(results)} PPT(s) generated in '{os.path.abspath(args.output)}'")
+    write_stats(args, processor)
+    if failed:
+        sys.exit(1)
+
+
+def serve_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="capslide serve",
+        description="CapSlide: Keep templates warm and render jobs sent over a local socket, one JSON job per line."
+    )
+    parser.add_argument("-t", "--template", help="Template to serve as ID=PATH, can be repeated.", action="append", required=True)
+    parser.add_argument("-u", "--socket", help="Path of the Unix socket to listen on.", default=None)
+    parser.add_argument("--port", help="Localhost TCP port to listen on when no socket is given (default: 8765).", default=8765, type=int)
+    parser.add_argument("-w", "--workers", help="Number of worker processes rendering jobs (default: CPU count).", default=None, type=int)
+    parser.add_argument("-o", "--output_dir", help="Directory jobs may write their outputs to, as paths relative to it (default: decks are only returned).", default=None)
+    parser.add_argument("-p", "--placeholder", help="The text placeholder used for jobs sending lines.", default="subtitle")
+    parser.add_argument("-i", "--ignore_marks", help="Exclude punctuation marks from the slides.", action="store_true")
+    parser.add_argument("-s", "--streaming", help="Write slides straight into the output file as they are generated.", action="store_true")
+    parser.add_argument("-c", "--cache_dir", help="Directory caching validated templates between runs (disabled by default).", default=None)
+
+    args = parser.parse_args(argv)
+
+    template_paths = {}
+    for template in args.template:
+        template_id, separator, template_path = template.partition("=")
+        if not separator or not template_id:
+            parser.error(f"Template '{template}' must be given as ID=PATH.")
+        if not os.path.exists(template_path):
+            print(f"Error: Template file '{template_path}' not found.")
+            sys.exit(1)
+        template_paths[template_id] = template_path
+
+    from .server import RenderServer
+
+    server = RenderServer(
+        template_paths,
+        workers=args.workers,
+        output_dir=args.output_dir,
+        placeholder=args.placeholder,
+        ignore_masks=args.ignore_marks,
+        streaming=args.streaming,
+        cache_dir=args.cache_dir
+    )
+    address = server.bind(socket_path=args.socket, port=args.port)
+    print(f"Status: Serving {len(template_paths)} template(s) on {address}...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+def inspect_main(argv):
+    parser = argparse.ArgumentParser(
+        prog="capslide inspect",
+        description="CapSlide: List the slides, layouts and #placeholder# tokens of a template, read straight from its XML."
+    )
+    parser.add_argument("template", help="Path to the template PPTX file.")
+    parser.add_argument("-n", "--template_slide_page_number",
+                        help="Fail unless this slide (1-based, 0 for the last slide) can be used as the template slide.",
+                        default=None, type=int)
+    parser.add_argument("--json", help="Print the slides as JSON.", action="store_true")
+
+    args = parser.parse_args(argv)
+    check_template_arguments(parser, args)
+
+    if not os.path.exists(args.template):
+        print(f"Error: Template file '{args.template}' not found.")
+        sys.exit(1)
+
+    from .inspection import inspect_template
+
+    try:
+        slides = inspect_template(args.template)
+    except Exception as e:
+        print(f"Error: Could not read template '{args.template}': {e}")
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(slides, ensure_ascii=False, indent=2))
+    else:
+        print(f"Template: '{args.template}' ({len(slides)} slide(s))")
+        for slide in slides:
+            placeholders = ", ".join(dict.fromkeys(slide["placeholders"])) or "none"
+            usable = " (usable)" if slide["usable"] else ""
+            print(f"  Slide {slide['page_number']} [{slide['layout']}]: {len(slide['placeholders'])} placeholder(s): {placeholders}{usable}")
+
+    if args.template_slide_page_number is not None:
+        page_number = args.template_slide_page_number or len(slides)
+        if not 1 <= page_number <= len(slides) or not slides[page_number - 1]["usable"]:
+            print(f"Error: Slide {page_number} cannot be used as the template slide, it needs a Blank layout and #placeholder# tokens.", file=sys.stderr)
+            sys.exit(1)
+    elif not any(slide["usable"] for slide in slides):
+        print("Error: No slide can be used as the template slide.", file=sys.stderr)
+        sys.exit(1)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    # Sub-commands, anything else is the single file command
+    if argv and argv[0] == "batch":
+        return batch_main(argv[1:])
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    if argv and argv[0] == "inspect":
+        return inspect_main(argv[1:])
+
+    parser = argparse.ArgumentParser(
+        description="CapSlide: A tool to convert subtitles (.json/.txt/.srt/.vtt/.csv) into professional PPT slides.",
+        epilog="Use 'capslide batch --help' to render many subtitle files against one template, "
+               "'capslide serve --help' to run a render daemon, "
+               "'capslide inspect --help' to check a template."
+    )
+
+    # 1. Positional Argument
+    parser.add_argument("subtitles", help="Path to the input subtitle file (.json/.ndjson/.txt/.srt/.vtt/.csv/.tsv).")
+
+    # 2. Template Arguments
+    add_template_arguments(parser)
+
+    # 3. Optional Arguments
+    parser.add_argument("-o", "--output", help="Path for the generated PPTX file, - for standard output (default: output.pptx).", default="output.pptx")
+
+    args = parser.parse_args(argv)
+    check_template_arguments(parser, args)
+
+    # --- Robustness Checks ---
+    if not os.path.exists(args.subtitles):
+        print(f"Error: Input file '{args.subtitles}' not found.")
+        sys.exit(1)
+
+    if not os.path.exists(args.template):
+        print(f"Error: Template file '{args.template}' not found.")
+        sys.exit(1)
+
+    # The deck goes to standard output, so do the messages to standard error
+    to_stdout = args.output == "-"
+    output = sys.stdout.buffer if to_stdout else args.output
+
+    with contextlib.redirect_stdout(sys.stderr if to_stdout else sys.stdout):
+        try:
+            # Initializing the processor
+            processor = create_processor(args, output)
+
+            print(f"Status: Processing '{args.subtitles}'...")
+
+            # 4. Trigger actual processing logic
+            processor.append_slides_from_file(args.subtitles)
+            processor.save()
+
+            if len(processor.output_paths) > 1:
+                print(f"Success: {len(processor.output_paths)} PPT(s) generated from '{processor.output_paths[0]}' to '{processor.output_paths[-1]}'")
+            else:
+                print(f"Success: PPT generated at '{processor.get_output_name()}'")
+            write_stats(args, processor)
+
+        except Exception as e:
+            print(f"An error occurred during processing: {e}")
+            if args.verbose:
+                import traceback
+                traceback.print_exc()
+            sys.exit(1)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,119 @@
+from copy import copy, deepcopy
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.parts.slide import SlidePart
+from pptx.opc.oxml import serialize_part_xml
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import qn
+from .placeholders import element_path, resolve_path
+
+'Bulk slide cloning from a prepared template shape tree'
+
+RELATIONSHIP_ATTRIBUTE_PREFIX = qn('r:id')[:-len('id')]
+
+class SlidePrototype:
+    """
+    The shape tree of a template slide, copied once when the template is loaded.
+    Every new slide receives a copy of the whole tree in a single operation.
+    Pictures and links refer to parts through the relationships of the source slide part,
+    new slides are related to the same parts, so an image is stored once however many slides show it.
+    """
+    def __init__(self, sld, source_part=None) -> None:
+        self.sld = sld
+        self.sp_tree = self.sld.cSld.spTree
+        self.source_part = source_part
+        # r:embed, r:link and r:id attributes of the shape tree as (path, attribute name, rId)
+        self.rel_attributes = [
+            (element_path(self.sp_tree, element), name, value)
+            for element in self.sp_tree.iter()
+            for name, value in element.attrib.items()
+            if name.startswith(RELATIONSHIP_ATTRIBUTE_PREFIX)
+        ]
+
+    @classmethod
+    def from_slide(cls, slide):
+        return cls(deepcopy(slide._element), slide.part)
+
+    @classmethod
+    def from_xml(cls, xml, source_part=None):
+        return cls(parse_xml(xml), source_part)
+
+    def with_source_part(self, source_part):
+        """The same prototype relating new slides to the parts of another copy of the source slide"""
+        prototype = copy(self)
+        prototype.source_part = source_part
+        return prototype
+
+    def to_xml(self):
+        """Serialized p:sld element, from_xml restores the prototype from it"""
+        return serialize_part_xml(self.sld)
+
+    def new_slide_element(self):
+        """A complete p:sld element for output engines that do not go through python-pptx slides"""
+        return deepcopy(self.sld)
+
+    def clone_into(self, slide):
+        """Replace the shape tree content of slide with a fresh copy of the prototype"""
+        sp_tree = slide.shapes._spTree
+        sp_tree[:] = deepcopy(self.sp_tree)
+        self.relate(slide.part, sp_tree)
+        return sp_tree
+
+    def relate(self, slide_part, sp_tree):
+        """
+        Relate slide_part to the parts the prototype refers to and point the
+        copied shape tree sp_tree at the new rIds where they differ
+        """
+        if not self.rel_attributes or self.source_part is None:
+            return
+        source_rels = self.source_part.rels
+        rIds = {}
+        for path, name, rId in self.rel_attributes:
+            if rId not in rIds:
+                rel = source_rels.get(rId)
+                if rel is None:
+                    rIds[rId] = rId
+                elif rel.is_external:
+                    rIds[rId] = slide_part.relate_to(rel.target_ref, rel.reltype, is_external=True)
+                else:
+                    rIds[rId] = slide_part.relate_to(rel.target_part, rel.reltype)
+            if rIds[rId] != rId:
+                resolve_path(sp_tree, path).set(name, rIds[rId])
+
+
+class SlideAppender:
+    """
+    Appends blank slides to a presentation.
+    python-pptx's Slides.add_slide searches every relationship and slide id of the
+    presentation for each new slide, here the next partname, rId and slide id are tracked instead.
+    """
+    def __init__(self, pptx, slide_layout) -> None:
+        self.package = pptx.part.package
+        self.presentation_part = pptx.part
+        self.sld_id_lst = pptx.slides._sldIdLst
+        self.slide_layout_part = slide_layout.part
+
+        self.partnames = set(str(part.partname) for part in self.package.iter_parts())
+        self.next_partname_number = len(self.sld_id_lst) + 1
+        self.next_slide_id = max([255] + [int(sld_id.get('id')) for sld_id in self.sld_id_lst]) + 1
+
+    def _next_partname(self):
+        while True:
+            partname = f'/ppt/slides/slide{self.next_partname_number}.xml'
+            self.next_partname_number += 1
+            if partname not in self.partnames:
+                self.partnames.add(partname)
+                return PackURI(partname)
+
+    def add_slide(self, slide_layout_part=None):
+        """Add a blank slide based on slide_layout_part, the layout of the appender by default, and return it"""
+        slide_part = SlidePart.new(self._next_partname(), self.package, slide_layout_part or self.slide_layout_part)
+        # The slide part is brand new, so there is no existing relationship to look for
+        rId = self.presentation_part.rels._add_relationship(RT.SLIDE, slide_part)
+
+        # Slides may have been added by other means meanwhile, never reuse their ids
+        if len(self.sld_id_lst):
+            self.next_slide_id = max(self.next_slide_id, int(self.sld_id_lst[-1].get('id')) + 1)
+        self.sld_id_lst._add_sldId(id=self.next_slide_id, rId=rId)
+        self.next_slide_id += 1
+        return slide_part.slide
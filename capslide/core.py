@@ -1,11 +1,32 @@
 from pptx import Presentation
+from pptx.opc.oxml import serialize_part_xml
+from pptx.oxml import parse_xml
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
 import os.path
-from copy import deepcopy
+import io
+import copy
 import json
-import re
+import hashlib
+from .placeholders import PlaceholderIndex, PLACEHOLDER_PATTERN, get_placeholders_pattern, substitute_placeholders, resolve_path
+from .cloning import SlidePrototype, SlideAppender
+from .writer import StreamingPptxWriter
+from .parallel import render_slides_in_parallel
+from .cache import TemplateCache
+from .incremental import SlideManifest, get_row_hash
+from .stats import Stats, ProgressReporter
+from .prune import prune_presentation
+from .zipwriter import write_package, check_zip_options, DEFAULT_COMPRESS_LEVEL
+from .normalize import TextNormalizer, PUNCTUATION_MASKS
+from .rows import RowStore
+from .inspection import BLANK_LAYOUT_NAMES
+from .autofit import TextFitter, get_fit_target, get_fit_targets
+from preprocessors import get_reader, read_json_rows, read_text_rows
 
 'Auto-fill subtitles into PPT'
 
+# Row key choosing the template slide (1-based page number) a row is rendered with
+TEMPLATE_KEY = '_template'
+
 class CapSlideError(Exception):
     """Base exception class for the CapSlide project"""
     pass
@@ -40,24 +61,155 @@ class SubtitlesTemplatePlaceholderError(PowerPointTemplateError):
         self.slide_index = slide_index
 
     
+class TemplateSlide:
+    """
+    A validated template slide with its placeholder index and the prototype slides are cloned from.
+    Slides generated from it are created on its own layout, whichever master the layout belongs to.
+    """
+    def __init__(self, page_number, slide, placeholder_index, slide_prototype) -> None:
+        self.page_number = page_number
+        self.slide = slide
+        self.placeholder_index = placeholder_index
+        self.slide_prototype = slide_prototype
+        self.slide_layout_part = slide.part.part_related_by(RT.SLIDE_LAYOUT)
+
+    def with_slide(self, slide):
+        """The same prepared template slide for the matching slide of another copy of the template"""
+        return TemplateSlide(self.page_number, slide, self.placeholder_index, self.slide_prototype.with_source_part(slide.part))
+
+
 class SubtitlesProcessor:
     """
     Main functionality is to read subtitles from a file and add them to a PPT.
     Subclasses can override the unify_subtitles method to implement different subtitle processing logic.
     """
-    def __init__(self, output_path, template_path, placeholder="subtitle", template_slide_page_number=0, ignore_masks=False, verbose=False) -> None:
+    def __init__(self, output_path, template_path, placeholder="subtitle", template_slide_page_number=0, ignore_masks=False, verbose=False, streaming=False, workers=1, cache_dir=None, incremental=False, progress_interval=1.0, prune=False, compression='deflate', compress_level=DEFAULT_COMPRESS_LEVEL, save_workers=None, max_slides_per_file=None, half_width=False, collapse_whitespace=False, max_length=None, autofit=False, font_file=None, punctuation_masks=None) -> None:
         self.root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        self._validate_template_pptx(template_path, template_slide_page_number)
+        # Timers and counters of every stage, see Stats
+        self.stats = Stats()
+        # Validated template slides are cached on disk when a cache directory is given
+        self.cache_dir = cache_dir
+        self.template_cache = TemplateCache(cache_dir) if cache_dir is not None else None
+        with self.stats.timer('load'):
+            self._validate_template_pptx(template_path, template_slide_page_number)
         self.placeholder = placeholder
         self.ignore_masks = ignore_masks
         
-        self.punctuation_masks = set('，。？！：；、…,.?!:;~')
+        # Marks stripped with ignore_masks, subclasses may change them until the first subtitle is cleaned up
+        self.punctuation_masks = set(PUNCTUATION_MASKS if punctuation_masks is None else punctuation_masks)
+        self.half_width = half_width
+        self.collapse_whitespace = collapse_whitespace
+        self.max_length = max_length
+        # Every value of a row goes through the normalizer once, see normalize_row and get_normalizer
+        self._normalizer = None
+        # With autofit, the font of every filled run shrinks until its text fits its box, see fit_run
+        self.autofit = autofit
+        self.font_file = font_file
+        self.text_fitter = TextFitter(font_file) if autofit else None
+        # Page number -> FitTarget of every indexed run of that template slide, see fit_slide
+        self._fit_targets = {}
         
-        output_path = self.merge_path(output_path, "outputs")
-        self.output_path = output_path
+        # A binary stream can be given instead of a path, save() then writes the deck into it
+        if isinstance(output_path, str):
+            output_path = self.merge_path(output_path, "outputs")
+        elif incremental or max_slides_per_file:
+            raise CapSlideError('Incremental and split runs need an output path')
+        if incremental and max_slides_per_file:
+            raise CapSlideError('Incremental runs cannot be split into several files')
+        if max_slides_per_file is not None and max_slides_per_file < 1:
+            raise CapSlideError(f'Invalid slide limit per file {max_slides_per_file}, expected at least 1')
+        # With a slide limit per file, the output path names the volumes, see get_volume_path
+        self.max_slides_per_file = max_slides_per_file
+        self.split_output_path = output_path
+        self.output_paths = []
+        self._volume_slides_count = 0
+        self.output_path = self.get_volume_path(1) if max_slides_per_file else output_path
         self.verbose = verbose
+        # Progress is reported at most once per interval seconds, every page when verbose, never when None
+        self.progress_interval = 0 if verbose else progress_interval
 
         self.output_pptx = self.template_pptx
+        self._blank_slide_layout = None
+        self._slide_appender = None
+
+        # With streaming, slides are written to the output file as they are generated
+        self.streaming = streaming or incremental
+        self._streaming_writer = None
+
+        # Incremental runs reuse the slides of unchanged rows from the previous output, see SlideManifest
+        self.incremental = incremental
+        self._slide_manifest = None
+
+        # With several workers, slides are rendered in a process pool and merged in order
+        self.workers = workers
+
+        # When pruning, the output keeps only the generated slides and the parts they use
+        self.prune = prune
+
+        # Output zip settings, parts are compressed on save_workers threads, see PackageZipWriter
+        # They are checked now rather than once every slide has been generated
+        try:
+            check_zip_options(compression, compress_level)
+        except ValueError as e:
+            raise CapSlideError(str(e)) from e
+        self.compression = compression
+        self.compress_level = compress_level
+        self.save_workers = save_workers
+
+    def spawn(self, output_path):
+        """
+        Create a processor for another output that shares the validated template.
+        The template is neither re-read nor re-validated, the output deck starts from an in-memory copy of it.
+        """
+        processor = copy.copy(self)
+        # A binary stream can be given instead of a path, save() then writes the deck into it
+        if isinstance(output_path, str):
+            output_path = self.merge_path(output_path, "outputs")
+        elif self.max_slides_per_file:
+            raise CapSlideError('Split runs need an output path')
+        processor.stats = Stats()
+        processor.split_output_path = output_path
+        processor.output_paths = []
+        processor._reset_output(processor.get_volume_path(1) if self.max_slides_per_file else output_path)
+        return processor
+
+    def _reset_output(self, output_path):
+        """Start a new output deck from an in-memory copy of the template"""
+        self.output_path = output_path
+        self._volume_slides_count = 0
+        # The streaming engine only reads the template deck, so it can be shared
+        if not self.streaming:
+            with self.stats.timer('load'):
+                self.output_pptx = self.template_pptx = Presentation(io.BytesIO(self.template_bytes))
+                # Template slides prepared so far are bound to the slides of the copy, not prepared again
+                self._template_slides = {
+                    page_number: template.with_slide(self.get_slide_by_page_number(self.template_pptx, page_number))
+                    for page_number, template in self._template_slides.items()
+                }
+                self._set_default_template_slide(self._template_slides[self.template_slide_page_number])
+        self._used_template_pages = set()
+        self._blank_slide_layout = None
+        self._slide_appender = None
+        self._streaming_writer = None
+        self._slide_manifest = None
+
+    def get_volume_path(self, number):
+        """Path of the numbered file of a split output, e.g. output_001.pptx"""
+        root, ext = os.path.splitext(self.split_output_path)
+        return f'{root}_{number:03d}{ext}'
+
+    def _start_slide(self):
+        """Count a new slide, saving the current file and starting the next one when it is full"""
+        if not self.max_slides_per_file:
+            return
+        if self._volume_slides_count >= self.max_slides_per_file:
+            with self.stats.timer('save'):
+                self._save()
+            self.output_paths.append(self.output_path)
+            print(f'File saved to {self.get_output_name()}')
+            # The saved deck is released, memory is bounded by the slides of one file
+            self._reset_output(self.get_volume_path(len(self.output_paths) + 1))
+        self._volume_slides_count += 1
 
     def merge_path(self, path, base_dir):
         """Convert relative paths to absolute paths based on the base directory"""
@@ -78,7 +230,11 @@ class SubtitlesProcessor:
             raise PowerPointTemplateNotFoundError(template_path)
         
         self.template_path = template_path
-        self.template_pptx = Presentation(self.template_path)
+        # Kept in memory so outputs can start from a copy of the template without reading the disk again
+        with open(self.template_path, 'rb') as f:
+            self.template_bytes = f.read()
+        self.template_pptx = Presentation(io.BytesIO(self.template_bytes))
+        self.template_slides_count = len(self.template_pptx.slides)
         
         if template_slide_page_number <= 0:
             template_slide_page_number = len(self.template_pptx.slides)
@@ -87,39 +243,122 @@ class SubtitlesProcessor:
             raise SubtitlesTemplateSlideIndexError(template_slide_page_number)
         
         self.template_slide_page_number = template_slide_page_number
-        
-        template_slide = self.get_slide_by_page_number(self.template_pptx, template_slide_page_number)
+        # Prepared template slides by page number, rows can choose one with the TEMPLATE_KEY key
+        self._template_slides = {}
+        self._used_template_pages = set()
+        self._set_default_template_slide(self.get_template_slide(template_slide_page_number))
+
+    def _set_default_template_slide(self, template):
+        self.template_slide = template.slide
+        self.placeholder_index = template.placeholder_index
+        self.slide_prototype = template.slide_prototype
+
+    def get_template_slide(self, page_number):
+        """The template slide of a page (1-based, 0 for the last slide), validated and prepared on first use"""
+        if page_number <= 0:
+            page_number = self.template_slides_count
+        template = self._template_slides.get(page_number)
+        if template is None:
+            template = self._prepare_template_slide(page_number)
+            self._template_slides[page_number] = template
+        return template
+
+    def _prepare_template_slide(self, page_number):
+        """Validate a template slide, then scan it once into a placeholder index and a prototype"""
+        if page_number - 1 >= self.template_slides_count:
+            raise SubtitlesTemplateSlideIndexError(page_number)
+
+        template_slide = self.get_slide_by_page_number(self.template_pptx, page_number)
+
+        if self.template_cache is not None:
+            cache_key = self.template_cache.get_key(self.template_bytes, page_number)
+            cache_entry = self.template_cache.get(cache_key)
+            if cache_entry is not None:
+                return self._load_template_cache_entry(page_number, template_slide, cache_entry)
 
         slide_layout = template_slide.slide_layout
         layout_name = slide_layout.name
         
         # Check for both English and Chinese 'Blank' layout names
-        if layout_name.lower() not in ['blank', '空白']:
+        if layout_name.lower() not in BLANK_LAYOUT_NAMES:
             raise SubtitlesTemplateSlideMasterError(layout_name)
 
-        self.template_slide = template_slide
-
-        matched_count = self.get_placeholders_count(self.template_slide)
+        matched_count = self.get_placeholders_count(template_slide)
         if matched_count == 0:
-            raise SubtitlesTemplatePlaceholderError(template_slide_page_number)
+            raise SubtitlesTemplatePlaceholderError(page_number)
+
+        # Scan the template slide once, generated slides are filled through this index
+        template = TemplateSlide(
+            page_number,
+            template_slide,
+            PlaceholderIndex.from_slide(template_slide),
+            SlidePrototype.from_slide(template_slide)
+        )
+
+        if self.template_cache is not None:
+            self.template_cache.put(cache_key, {
+                'layout_name': layout_name,
+                'placeholders_count': matched_count,
+                'placeholder_index': template.placeholder_index.dump(),
+                'slide_prototype': template.slide_prototype.to_xml().decode('utf-8'),
+            })
         
-        print(f'Found {matched_count} placeholders in slide index {self.template_slide_page_number} of template {self.template_path}.')
+        print(f'Found {matched_count} placeholders in slide index {page_number} of template {self.template_path}.')
+        return template
+
+    def _load_template_cache_entry(self, page_number, template_slide, cache_entry):
+        """Restore a template slide validated by a previous run"""
+        template = TemplateSlide(
+            page_number,
+            template_slide,
+            PlaceholderIndex.load(cache_entry['placeholder_index']),
+            SlidePrototype.from_xml(cache_entry['slide_prototype'].encode('utf-8'), template_slide.part)
+        )
+
+        print(f'Found {cache_entry["placeholders_count"]} placeholders in slide index {page_number} of template {self.template_path} (cached).')
+        return template
+
+    def get_row_template_slide(self, row):
+        """The template slide a row chooses with the TEMPLATE_KEY key, the default one otherwise"""
+        page_number = row.get(TEMPLATE_KEY)
+        # Blank cells of delimited files leave the row on the default template slide
+        if page_number is None or (isinstance(page_number, str) and not page_number.strip()):
+            page_number = self.template_slide_page_number
+        elif isinstance(page_number, int) and not isinstance(page_number, bool):
+            pass
+        elif isinstance(page_number, float) and page_number.is_integer():
+            page_number = int(page_number)
+        elif isinstance(page_number, str) and page_number.strip().isdecimal():
+            page_number = int(page_number)
+        else:
+            # Neither booleans nor fractional numbers are silently turned into a page
+            raise CapSlideError(f'Invalid template slide page number {page_number!r} in row')
+        template = self.get_template_slide(page_number)
+        self._used_template_pages.add(template.page_number)
+        return template
+
+    def route_row(self, row):
+        """Return the template slide of a row and its normalized values"""
+        template = self.get_row_template_slide(row)
+        if TEMPLATE_KEY in row:
+            row = {key: value for key, value in row.items() if key != TEMPLATE_KEY}
+        return template, self.normalize_row(row)
 
     def get_placeholders_count(self, slide, placeholder=None):
         """Count the number of placeholders in the template slide"""
         master_count = 0
 
         if placeholder is None:
-            pattern = r'#\w+?#'
+            pattern = PLACEHOLDER_PATTERN
         else:
-            pattern = f'#{placeholder}#'
+            pattern = get_placeholders_pattern((placeholder,))
 
         for shape in slide.shapes:
             if shape.has_text_frame:
                 text_frame = shape.text_frame
                 for paragraph in text_frame.paragraphs:
                     for run in paragraph.runs:
-                        matches = re.findall(pattern, run.text)
+                        matches = pattern.findall(run.text)
                         master_count += len(matches)
             if shape.has_table:
                 table = shape.table
@@ -128,26 +367,42 @@ class SubtitlesProcessor:
                         text_frame = cell.text_frame
                         for paragraph in text_frame.paragraphs:
                             for run in paragraph.runs:
-                                matches = re.findall(pattern, run.text)
+                                matches = pattern.findall(run.text)
                                 master_count += len(matches)
         return master_count
     
-    def duplicate_slide(self, source_slide):
-        """Duplicate a specified slide"""
-        # Typically a blank layout
-        blank_slide_layout = self.template_pptx.slide_layouts.get_by_name('Blank')
-        if blank_slide_layout is None:
-            blank_slide_layout = self.template_pptx.slide_layouts.get_by_name('空白')
+    def get_blank_slide_layout(self):
+        """Find the Blank layout of the output presentation, looked up once and cached"""
+        if self._blank_slide_layout is None:
+            # Typically a blank layout
+            blank_slide_layout = self.output_pptx.slide_layouts.get_by_name('Blank')
+            if blank_slide_layout is None:
+                blank_slide_layout = self.output_pptx.slide_layouts.get_by_name('空白')
+
+            if blank_slide_layout is None:            
+                raise Exception("Could not find a blank slide layout")
+
+            self._blank_slide_layout = blank_slide_layout
+            self._slide_appender = SlideAppender(self.output_pptx, blank_slide_layout)
+        return self._blank_slide_layout
+
+    def get_slide_appender(self):
+        """The SlideAppender of the output presentation, adding slides on the Blank layout unless given another"""
+        self.get_blank_slide_layout()
+        return self._slide_appender
 
-        if blank_slide_layout is None:            
-            raise Exception("Could not find a blank slide layout")
-
-        new_slide = self.output_pptx.slides.add_slide(blank_slide_layout)
-
-        for shape in source_slide.shapes:
-            el = shape.element
-            new_el = deepcopy(el)
-            new_slide.shapes._spTree.insert_element_before(new_el, 'p:extLst')
+    def duplicate_slide(self, source_slide):
+        """Duplicate a specified slide, on the layout of the template slide it is"""
+        with self.stats.timer('clone'):
+            slide_appender = self.get_slide_appender()
+            for template in self._template_slides.values():
+                if source_slide is template.slide:
+                    new_slide = slide_appender.add_slide(template.slide_layout_part)
+                    template.slide_prototype.clone_into(new_slide)
+                    break
+            else:
+                new_slide = slide_appender.add_slide()
+                SlidePrototype.from_slide(source_slide).clone_into(new_slide)
 
         return new_slide
 
@@ -159,137 +414,397 @@ class SubtitlesProcessor:
 
     def replace_placeholder(self, obj, placeholder, text): 
         """Replace text in a text frame or table cell"""
+        return self.replace_placeholders(obj, {placeholder: text})
+
+    def replace_placeholders(self, obj, values, pattern=None, box=None):
+        """
+        Replace every placeholder of values in a text frame or table cell, scanning each run once.
+        box is the (width, height) of the shape or cell, filled runs are fitted into it with autofit.
+        """
         matched_count = 0
-        
+        if pattern is None:
+            pattern = get_placeholders_pattern(tuple(values))
+
         text_frame = obj.text_frame
-        pattern = f'#{placeholder}#'
         for p in text_frame.paragraphs:
             for r in p.runs:
-                # Modifying text within the run preserves existing formatting
-                if r.text.find(pattern) >= 0:
-                    r.text = r.text.replace(pattern, text)
-                    matched_count += 1
-                    # print('Replaced text:', r.text)
+                text = r.text
+                # Most runs hold no placeholder at all
+                if '#' not in text:
+                    continue
+                text, replaced_count = substitute_placeholders(text, values, pattern)
+                if replaced_count:
+                    # Modifying text within the run preserves existing formatting
+                    r.text = text
+                    matched_count += replaced_count
+                    if self.text_fitter is not None and box is not None:
+                        self.fit_run(r, p, obj, box)
         return matched_count
 
+    def fit_run(self, run, paragraph, obj, box):
+        """Shrink the font of a run until its text fits the box of its text frame or table cell"""
+        target = get_fit_target(run, paragraph, obj, box)
+        if target is None:
+            return
+        with self.stats.timer('autofit'):
+            size = self.text_fitter.fit(run.text, target)
+        if size < target.max_size:
+            run.font.size = size
+
+    def fit_slide(self, template, sp_tree, values):
+        """Shrink the font of every indexed run filled with values until its text fits, like fit_run"""
+        fit_targets = self._fit_targets.get(template.page_number)
+        if fit_targets is None:
+            fit_targets = self._fit_targets[template.page_number] = get_fit_targets(template.slide, template.placeholder_index)
+        with self.stats.timer('autofit'):
+            for run, target in zip(template.placeholder_index.runs, fit_targets):
+                if target is None or not any(name in values for name in run.names):
+                    continue
+                r = resolve_path(sp_tree, run.path)
+                size = self.text_fitter.fit(r.text, target)
+                if size < target.max_size:
+                    r.get_or_add_rPr().sz = size.centipoints
+
     def replace_placeholder_of_slide(self, slide, placeholder, text):
         """Replace text placeholders throughout the slide"""
+        return self.replace_placeholders_of_slide(slide, {placeholder: text})
+
+    def replace_placeholders_of_slide(self, slide, row):
+        """Replace the placeholders of every key of a row throughout the slide, in one pass per run"""
         matched_count = 0
-        if self.ignore_masks:
-            text = ''.join(filter(lambda x: x not in self.punctuation_masks, text))
+        values = self.normalize_row(row)
+        if not values:
+            return matched_count
+        pattern = get_placeholders_pattern(tuple(values))
 
         for shape in slide.shapes:
             # If subtitles are in a text box, replace the text frame content
             if shape.has_text_frame:
-                matched_count += self.replace_placeholder(shape, placeholder, text)
+                box = (shape.width, shape.height) if shape.width is not None and shape.height is not None else None
+                matched_count += self.replace_placeholders(shape, values, pattern, box)
             # If subtitles are in a table, iterate through each cell
             if shape.has_table:
                 table = shape.table
-                for row in table.rows:
-                    for cell in row.cells:
-                        matched_count += self.replace_placeholder(cell, placeholder, text)
+                column_widths = [column.width for column in table.columns]
+                for table_row in table.rows:
+                    for cell, column_width in zip(table_row.cells, column_widths):
+                        matched_count += self.replace_placeholders(cell, values, pattern, (column_width, table_row.height))
         
         return matched_count
 
+    def get_normalizer(self):
+        """Create the TextNormalizer of the cleanup options and punctuation_masks on first use"""
+        if self._normalizer is None:
+            self._normalizer = TextNormalizer(
+                strip_punctuation=self.ignore_masks,
+                punctuation=''.join(sorted(self.punctuation_masks)),
+                half_width=self.half_width,
+                collapse_whitespace=self.collapse_whitespace,
+                max_length=self.max_length
+            )
+        return self._normalizer
+
+    def unify_subtitles(self, text):
+        """Clean up a subtitle text before it is inserted into a slide"""
+        return self.get_normalizer()(text)
+
+    def normalize_row(self, row):
+        """Clean up every value of a row once, before any slide is filled with it"""
+        return {placeholder: self.unify_subtitles(text) for placeholder, text in row.items()}
+
+    def get_streaming_writer(self):
+        """Open the output zip of the streaming engine on first use"""
+        if self._streaming_writer is None:
+            output_path = self.output_path
+            if self.incremental:
+                # The previous deck is still read from while the new one is written
+                output_path = f'{output_path}.tmp'
+            pptx, template_slide = self.output_pptx, self.template_slide
+            if self.prune:
+                # The shared template deck must stay intact, a private copy of it is pruned
+                pptx = Presentation(io.BytesIO(self.template_bytes))
+                template_slide = self.get_slide_by_page_number(pptx, self.template_slide_page_number)
+                # Layouts are written before any row is routed, so the layouts of every slide rows can be
+                # routed to are kept: template slides can only be based on a Blank layout
+                routable_layout_parts = [
+                    slide.part.slide_layout.part for slide in pptx.slides
+                    if slide.slide_layout.name.lower() in BLANK_LAYOUT_NAMES
+                ]
+                prune_presentation(pptx, self.template_slides_count, routable_layout_parts)
+            self._streaming_writer = StreamingPptxWriter(output_path, pptx, template_slide, **self.get_zip_options())
+        return self._streaming_writer
+
+    def get_zip_options(self):
+        """Arguments of the PackageZipWriter writing the output"""
+        return dict(
+            compression=self.compression,
+            compress_level=self.compress_level,
+            workers=self.save_workers,
+        )
+
+    def get_render_fingerprint(self):
+        """Hash of everything besides the row that a generated slide depends on"""
+        data = json.dumps([
+            hashlib.sha256(self.template_bytes).hexdigest(),
+            self.template_slide_page_number,
+            self.ignore_masks,
+            self.get_normalizer().get_options(),
+            [self.autofit, self.font_file],
+        ])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get_slide_manifest(self):
+        """Load the manifest of the previous run on first use"""
+        if self._slide_manifest is None:
+            self._slide_manifest = SlideManifest(self.output_path, self.get_render_fingerprint())
+        return self._slide_manifest
+
+    def append_slide_incrementally(self, row):
+        """Add a new slide at the end, reusing the slide of the previous run when the row is unchanged"""
+        slide_manifest = self.get_slide_manifest()
+        row_hash = get_row_hash(row)
+        previous = slide_manifest.lookup(row_hash)
+        if previous is not None:
+            slide_xml, matched_count = previous
+            # The template choice is part of the row, so of its hash
+            template = self.get_row_template_slide(row)
+            self.stats.count('reused_slides')
+        else:
+            matched_count, slide_xml, page_number = self.render_slide_xml(row)
+            template = self.get_template_slide(page_number)
+        with self.stats.timer('write'):
+            partname = self.get_streaming_writer().add_slide(slide_xml, template.slide)
+        slide_manifest.record(row_hash, partname, matched_count)
+        return matched_count
+
+    def render_slide_xml(self, row):
+        """
+        Fill a copy of the template slide of a row with it,
+        return the matched count, the slide XML and the page number of the template slide
+        """
+        template, values = self.route_row(row)
+        with self.stats.timer('clone'):
+            slide_element = template.slide_prototype.new_slide_element()
+        with self.stats.timer('replace'):
+            matched_count = template.placeholder_index.fill(slide_element.cSld.spTree, values)
+        if self.text_fitter is not None:
+            self.fit_slide(template, slide_element.cSld.spTree, values)
+        with self.stats.timer('write'):
+            slide_xml = serialize_part_xml(slide_element)
+        return matched_count, slide_xml, template.page_number
+
+    def append_slide_xml(self, slide_xml, page_number=None):
+        """Add a new slide at the end from slide XML produced by render_slide_xml from the template slide of page_number"""
+        self._start_slide()
+        template = self.get_template_slide(page_number or self.template_slide_page_number)
+        self._used_template_pages.add(template.page_number)
+        if self.streaming:
+            with self.stats.timer('write'):
+                self.get_streaming_writer().add_slide(slide_xml, template.slide)
+        else:
+            with self.stats.timer('clone'):
+                new_slide = self.get_slide_appender().add_slide(template.slide_layout_part)
+                sp_tree = new_slide.shapes._spTree
+                sp_tree[:] = parse_xml(slide_xml).cSld.spTree
+                # The slide XML refers to the parts of the template slide by its rIds
+                template.slide_prototype.relate(new_slide.part, sp_tree)
+
     def append_slide_with_row(self, row):
         """Add a new slide at the end and fill it with subtitle data"""
-        matched_count = 0
-        new_slide = self.duplicate_slide(self.template_slide)
-        for placeholder, text in row.items():
-            matched_count += self.replace_placeholder_of_slide(new_slide, placeholder, text)
+        self._start_slide()
+        if self.incremental:
+            return self.append_slide_incrementally(row)
+
+        if self.streaming:
+            matched_count, slide_xml, page_number = self.render_slide_xml(row)
+            with self.stats.timer('write'):
+                self.get_streaming_writer().add_slide(slide_xml, self.get_template_slide(page_number).slide)
+            return matched_count
+
+        template, values = self.route_row(row)
+        new_slide = self.duplicate_slide(template.slide)
+        # Only the runs recorded in the placeholder index are visited
+        with self.stats.timer('replace'):
+            matched_count = template.placeholder_index.fill(new_slide.shapes._spTree, values)
+        if self.text_fitter is not None:
+            self.fit_slide(template, new_slide.shapes._spTree, values)
     
         return matched_count    
 
+    def get_worker_options(self):
+        """Arguments a worker process creates its own SubtitlesProcessor with"""
+        return dict(
+            output_path=self.output_path,
+            template_path=self.template_path,
+            placeholder=self.placeholder,
+            template_slide_page_number=self.template_slide_page_number,
+            ignore_masks=self.ignore_masks,
+            half_width=self.half_width,
+            collapse_whitespace=self.collapse_whitespace,
+            max_length=self.max_length,
+            punctuation_masks=''.join(sorted(self.punctuation_masks)),
+            autofit=self.autofit,
+            font_file=self.font_file,
+            cache_dir=self.cache_dir,
+        )
+
+    def iter_appended_slides(self, rows):
+        """Add a slide for every row, yielding the matched count of each"""
+        # Incremental runs only render changed rows, which happens in this process
+        if self.workers > 1 and not self.incremental:
+            for matched_count, slide_xml, page_number in render_slides_in_parallel(rows, self.get_worker_options(), self.workers, stats=self.stats):
+                self.append_slide_xml(slide_xml, page_number)
+                yield matched_count
+        else:
+            for row in rows:
+                yield self.append_slide_with_row(row)
+
     def append_slides_with_rows(self, rows):
         """Add multiple slides at the end and fill with subtitle data"""
         total_matched_count = 0
         page_count = 0
-        for row in rows:
-            matched_count = self.append_slide_with_row(row)
+        progress = ProgressReporter(self.progress_interval) if self.progress_interval is not None else None
+        for matched_count in self.iter_appended_slides(rows):
+            self.stats.count('rows')
             if matched_count > 0:
                 page_count += 1
                 total_matched_count += matched_count
-                print(f'Successfully added page {page_count}! {matched_count} subtitle(s) inserted.')
+                if progress is not None:
+                    progress.update(page_count, total_matched_count, matched_count)
+        self.stats.count('pages', page_count)
+        self.stats.count('placeholders', total_matched_count)
         return total_matched_count, page_count  
     
-    def append_slides_from_json_file(self, json_file_path):
-        """Read subtitles from a JSON file and add them to slides"""
-        json_file_path = self.merge_path(json_file_path, "data")
+    def append_slides_with_columns(self, columns):
+        """
+        Add a slide per row of pre-built columns, a mapping of placeholder name -> sequence of values.
+        The columns are read in place through a RowStore, no dict is built per row.
+        """
+        return self.append_slides_with_rows(RowStore.from_columns(columns))
+
+    def append_slides_from_reader(self, file_path, reader):
+        """Add slides for the rows a reader of the preprocessors registry generates from a file"""
+        file_path = self.merge_path(file_path, "data")
 
-        if not os.path.exists(json_file_path):
-            raise Exception(f'Subtitle file {json_file_path} does not exist!')
-        
-        with open(json_file_path, 'r') as f:
-            rows = json.load(f)
-            rows_count = len(rows)
+        if not os.path.exists(file_path):
+            raise Exception(f'Subtitle file {file_path} does not exist!')
 
-            matched_count, slides_count = self.append_slides_with_rows(rows)
-            
-            print('*' * 40)
-            print(f'Added {slides_count} of {rows_count} slides successfully! Total subtitles added: {matched_count}.')
+        rows_count = 0
+        def count_rows(rows):
+            nonlocal rows_count
+            for row in rows:
+                rows_count += 1
+                yield row
 
-            return matched_count, slides_count
+        # Rows are read one at a time while the slides are being filled
+        matched_count, slides_count = self.append_slides_with_rows(count_rows(reader(file_path, self.placeholder)))
 
-    def append_slides_from_text_file(self, text_file_path, placeholder='subtitle'):
-        """Read subtitles from a text file and add them to slides"""
-        text_file_path = self.merge_path(text_file_path, "data")
-        
-        if not os.path.exists(text_file_path):
-            raise Exception(f'Subtitle file {text_file_path} does not exist!')
-        
-        with open(text_file_path, 'r') as f:
-            content = f.readlines()
-            lines = [line.strip() for line in content if line.strip()] 
-            rows = []
-            for line in lines:
-                row = {self.placeholder: line}
-                rows.append(row)
-        
-            rows_count = len(rows)
+        print('*' * 40)
+        print(f'Added {slides_count} of {rows_count} slides successfully! Total subtitles added: {matched_count}.')
 
-            matched_count, slides_count = self.append_slides_with_rows(rows)
-            
-            print('*' * 40)
-            print(f'Added {slides_count} of {rows_count} slides successfully! Total subtitles added: {matched_count}.')
+        return matched_count, slides_count
 
-            return matched_count, slides_count
+    def append_slides_from_json_file(self, json_file_path):
+        """Read subtitles from a JSON file and add them to slides"""
+        return self.append_slides_from_reader(json_file_path, read_json_rows)
 
     def append_slides_from_text_file(self, text_file_path):
         """Read subtitles from a text file and add them to slides"""
-        text_file_path = self.merge_path(text_file_path, "data")
-        
-        if not os.path.exists(text_file_path):
-            raise Exception(f'Subtitle file {text_file_path} does not exist!')
-        
-        with open(text_file_path, 'r') as f:
-            content = f.readlines()
-            lines = [line.strip() for line in content if line.strip()] 
-            rows = []
-            for line in lines:
-                row = {self.placeholder: line}
-                rows.append(row)
-        
-            rows_count = len(rows)
-
-            matched_count, slides_count = self.append_slides_with_rows(rows)
-            
-            print('*' * 40)
-            print(f'Added {slides_count} of {rows_count} slides successfully! Total subtitles added: {matched_count}.')
-
-            return matched_count, slides_count
+        return self.append_slides_from_reader(text_file_path, read_text_rows)
 
     def append_slides_from_file(self, file_path):
+        """Read subtitles from any file type with a registered reader, see preprocessors.register_reader"""
         file_path = self.merge_path(file_path, "data")
-        if file_path.endswith(".json"):
-            return self.append_slides_from_json_file(file_path)
-        elif file_path.endswith(".txt"):
-            return self.append_slides_from_text_file(file_path)
-        else:
+        reader = get_reader(file_path)
+        if reader is None:
             raise Exception(f"Unsupported subtitle file type: {file_path}")
+        return self.append_slides_from_reader(file_path, reader)
+
+    def get_checkpoint_path(self, checkpoint_path=None):
+        """The path save_checkpoint writes to, raising CapSlideError when this processor cannot save checkpoints"""
+        if self.streaming:
+            raise CapSlideError('Checkpoints need the python-pptx engine, streamed decks are only complete once saved')
+        checkpoint_path = checkpoint_path or self.output_path
+        if not isinstance(checkpoint_path, str):
+            raise CapSlideError('Checkpoints need a path')
+        return checkpoint_path
+
+    def save_checkpoint(self, checkpoint_path=None):
+        """
+        Write the deck generated so far to checkpoint_path (the output path by default) without
+        changing it, so slides can still be added and saved afterwards.
+        The template slides are left out of the slide list, their parts are kept in the file.
+        """
+        checkpoint_path = self.get_checkpoint_path(checkpoint_path)
+
+        presentation_part = self.output_pptx.part
+        presentation = copy.deepcopy(presentation_part._element)
+        sld_id_lst = presentation.get_or_add_sldIdLst()
+        if self.prune:
+            removed_page_numbers = range(1, self.template_slides_count + 1)
+        else:
+            removed_page_numbers = self._used_template_pages | {self.template_slide_page_number}
+        template_sld_ids = list(sld_id_lst)[:self.template_slides_count]
+        for page_number in removed_page_numbers:
+            sld_id_lst.remove(template_sld_ids[page_number - 1])
+
+        with self.stats.timer('checkpoint'):
+            # Readers never see a half written checkpoint
+            temp_path = f'{checkpoint_path}.tmp'
+            write_package(
+                presentation_part.package, temp_path,
+                blobs={presentation_part: serialize_part_xml(presentation)},
+                **self.get_zip_options()
+            )
+            os.replace(temp_path, checkpoint_path)
+
+    async def append_slides_with_async_rows(self, rows, queue_size=64, batch_size=32, checkpoint_interval=None, checkpoint_path=None):
+        """Add a slide for every row of an async iterator as rows arrive, see aio.append_slides_from_async_rows"""
+        from .aio import append_slides_from_async_rows
+
+        return await append_slides_from_async_rows(
+            self, rows,
+            queue_size=queue_size,
+            batch_size=batch_size,
+            checkpoint_interval=checkpoint_interval,
+            checkpoint_path=checkpoint_path
+        )
 
     def save(self):
-        # Remove the original template slide before saving
-        self.remove_slide(self.template_slide_page_number)
-        self.output_pptx.save(self.output_path)
+        with self.stats.timer('save'):
+            self._save()
+        self.output_paths.append(self.output_path)
         print()
-        print(f'Processing complete! File saved to {self.output_path}')
\ No newline at end of file
+        print(f'Processing complete! File saved to {self.get_output_name()}')
+
+    def get_output_name(self):
+        """Readable name of the output for messages: its path, or what the stream it is written to is"""
+        if isinstance(self.output_path, str):
+            return self.output_path
+        name = getattr(self.output_path, 'name', None)
+        if name == '<stdout>':
+            return 'standard output'
+        # Binary files opened by the caller are named after their path
+        if isinstance(name, str):
+            return name
+        return 'an in-memory stream'
+
+    def _save(self):
+        if self.streaming:
+            # Slides are already in the zip, only the slide list is left to write
+            self.get_streaming_writer().close()
+            if self.incremental:
+                slide_manifest = self.get_slide_manifest()
+                slide_manifest.close()
+                os.replace(f'{self.output_path}.tmp', self.output_path)
+                slide_manifest.write()
+                print(f'Reused {slide_manifest.reused_count} of {len(slide_manifest.slides)} slides from the previous run.')
+        else:
+            if self.prune:
+                # Drop every template slide and the layouts, images and notes only they use
+                prune_presentation(self.output_pptx, self.template_slides_count)
+            else:
+                # Remove the original template slides before saving, the last one first so the page numbers hold
+                for page_number in sorted(self._used_template_pages | {self.template_slide_page_number}, reverse=True):
+                    self.remove_slide(page_number)
+            write_package(self.output_pptx.part.package, self.output_path, **self.get_zip_options())
\ No newline at end of file
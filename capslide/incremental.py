@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import zipfile
+
+'Sidecar manifest mapping row content to the slide parts of a generated deck'
+
+MANIFEST_FORMAT_VERSION = 1
+
+def get_row_hash(row):
+    """Content hash of a row, independent of key order"""
+    # Rows can be any mapping, e.g. the row views of a RowStore
+    data = json.dumps(dict(row), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def get_manifest_path(output_path):
+    return f'{output_path}.manifest.json'
+
+
+class SlideManifest:
+    """
+    Per-row content hashes of a deck mapped to its slide parts.
+    The manifest of the previous run is loaded with its deck, so slides of unchanged rows
+    can be copied from it byte-for-byte instead of being generated again.
+    A fingerprint of the template and the rendering options guards against reusing stale slides.
+    """
+    def __init__(self, output_path, fingerprint) -> None:
+        self.output_path = output_path
+        self.fingerprint = fingerprint
+        self.slides = []
+        self.previous_slides = {}
+        self.previous_zip = None
+        self.reused_count = 0
+        self._load_previous()
+
+    def _load_previous(self):
+        try:
+            with open(get_manifest_path(self.output_path), 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') != MANIFEST_FORMAT_VERSION or manifest.get('fingerprint') != self.fingerprint:
+                return
+            # The deck is replaced at the end of the run, the open handle keeps reading the previous one
+            self.previous_zip = zipfile.ZipFile(self.output_path, 'r')
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return
+
+        names = set(self.previous_zip.namelist())
+        for row_hash, part_name, matched_count in manifest['slides']:
+            if part_name in names:
+                self.previous_slides.setdefault(row_hash, (part_name, matched_count))
+
+    def lookup(self, row_hash):
+        """Return (slide_xml, matched_count) of an unchanged row, or None"""
+        previous = self.previous_slides.get(row_hash)
+        if previous is None:
+            return None
+        part_name, matched_count = previous
+        self.reused_count += 1
+        return self.previous_zip.read(part_name), matched_count
+
+    def record(self, row_hash, partname, matched_count):
+        self.slides.append((row_hash, partname.membername, matched_count))
+
+    def close(self):
+        """Release the previous deck, which must happen before the new one replaces it on Windows"""
+        if self.previous_zip is not None:
+            self.previous_zip.close()
+            self.previous_zip = None
+
+    def write(self):
+        """Write the manifest of the new deck"""
+        manifest_path = get_manifest_path(self.output_path)
+        temp_path = f'{manifest_path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_FORMAT_VERSION, 'fingerprint': self.fingerprint, 'slides': self.slides}, f)
+        os.replace(temp_path, manifest_path)
+
+    def save(self):
+        """Release the previous deck and write the manifest of the new one"""
+        self.close()
+        self.write()
@@ -0,0 +1,106 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ElementTree
+from .placeholders import PLACEHOLDER_PATTERN
+
+'Read the slides, layouts and placeholders of a template straight from its zip'
+
+PML_NS = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+DML_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PACKAGE_RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+RT_OFFICE_DOCUMENT = f'{R_NS}/officeDocument'
+RT_SLIDE_LAYOUT = f'{R_NS}/slideLayout'
+BLANK_LAYOUT_NAMES = ('blank', '空白')
+
+def read_rels(package, member_name):
+    """Relationships of a zip member as rId -> (relationship type, target member name)"""
+    base_dir, file_name = posixpath.split(member_name)
+    rels_name = posixpath.join(base_dir, '_rels', f'{file_name}.rels')
+    try:
+        root = ElementTree.fromstring(package.read(rels_name))
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.iter(f'{{{PACKAGE_RELS_NS}}}Relationship'):
+        if rel.get('TargetMode') == 'External':
+            continue
+        target = rel.get('Target')
+        target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(base_dir, target))
+        rels[rel.get('Id')] = (rel.get('Type'), target)
+    return rels
+
+
+def iter_paragraph_run_texts(text_body):
+    """Texts of the runs of a text body, fields and line breaks excluded like python-pptx's paragraph runs"""
+    for paragraph in text_body.iterfind(f'{{{DML_NS}}}p'):
+        for run in paragraph.iterfind(f'{{{DML_NS}}}r'):
+            text = run.find(f'{{{DML_NS}}}t')
+            if text is not None and text.text:
+                yield text.text
+
+
+def iter_run_texts(slide):
+    """
+    Texts of the runs SubtitlesProcessor fills: those of top-level text frames and table cells.
+    Shapes within groups are not filled, so they are not read either.
+    """
+    sp_tree = slide.find(f'{{{PML_NS}}}cSld/{{{PML_NS}}}spTree')
+    if sp_tree is None:
+        return
+    for shape in sp_tree:
+        if shape.tag == f'{{{PML_NS}}}sp':
+            text_body = shape.find(f'{{{PML_NS}}}txBody')
+            if text_body is not None:
+                yield from iter_paragraph_run_texts(text_body)
+        elif shape.tag == f'{{{PML_NS}}}graphicFrame':
+            table = shape.find(f'{{{DML_NS}}}graphic/{{{DML_NS}}}graphicData/{{{DML_NS}}}tbl')
+            if table is None:
+                continue
+            for cell in table.iterfind(f'{{{DML_NS}}}tr/{{{DML_NS}}}tc'):
+                text_body = cell.find(f'{{{DML_NS}}}txBody')
+                if text_body is not None:
+                    yield from iter_paragraph_run_texts(text_body)
+
+
+def inspect_slide(package, member_name):
+    """Layout name and placeholder names of a slide, counted per run like SubtitlesProcessor does"""
+    layout_name = None
+    for reltype, target in read_rels(package, member_name).values():
+        if reltype == RT_SLIDE_LAYOUT:
+            c_sld = ElementTree.fromstring(package.read(target)).find(f'{{{PML_NS}}}cSld')
+            layout_name = c_sld.get('name', '') if c_sld is not None else ''
+            break
+
+    placeholders = []
+    for text in iter_run_texts(ElementTree.fromstring(package.read(member_name))):
+        if '#' in text:
+            placeholders.extend(PLACEHOLDER_PATTERN.findall(text))
+
+    return {
+        'layout': layout_name,
+        'placeholders': placeholders,
+        'usable': bool(placeholders) and (layout_name or '').lower() in BLANK_LAYOUT_NAMES,
+    }
+
+
+def inspect_template(template_path):
+    """
+    List the slides of a template in order with their layout, #placeholder# tokens and
+    whether they can be used as a template slide, without building the python-pptx object model
+    """
+    with zipfile.ZipFile(template_path) as package:
+        presentation_name = next(
+            target for reltype, target in read_rels(package, '').values() if reltype == RT_OFFICE_DOCUMENT
+        )
+        presentation_rels = read_rels(package, presentation_name)
+        presentation = ElementTree.fromstring(package.read(presentation_name))
+
+        slides = []
+        sld_id_lst = presentation.find(f'{{{PML_NS}}}sldIdLst')
+        for page_number, sld_id in enumerate(sld_id_lst if sld_id_lst is not None else [], 1):
+            reltype, member_name = presentation_rels[sld_id.get(f'{{{R_NS}}}id')]
+            slide = inspect_slide(package, member_name)
+            slide['page_number'] = page_number
+            slides.append(slide)
+        return slides
@@ -0,0 +1,70 @@
+from functools import lru_cache
+
+'Text normalization applied to every subtitle before it is inserted'
+
+PUNCTUATION_MASKS = '，。？！：；、…,.?!:;~'
+FULL_WIDTH_OFFSET = 0xFEE0
+IDEOGRAPHIC_SPACE = '　'
+
+def get_half_width_table():
+    """Translation table of full-width ASCII variants and the ideographic space to their half-width forms"""
+    table = {code: code - FULL_WIDTH_OFFSET for code in range(0xFF01, 0xFF5F)}
+    table[ord(IDEOGRAPHIC_SPACE)] = ord(' ')
+    return table
+
+
+class TextNormalizer:
+    """
+    Normalizes subtitle texts through a single precompiled translation table:
+    full-width to half-width conversion and punctuation stripping, then optional
+    whitespace collapsing and truncation to max_length characters ending with truncation_mark.
+    Subtitles repeat a lot, results are memoized in a cache of cache_size texts.
+    """
+    def __init__(self, strip_punctuation=False, punctuation=PUNCTUATION_MASKS, half_width=False,
+                 collapse_whitespace=False, max_length=None, truncation_mark='…', cache_size=4096) -> None:
+        self.strip_punctuation = strip_punctuation
+        self.punctuation = punctuation
+        self.half_width = half_width
+        self.collapse_whitespace = collapse_whitespace
+        self.max_length = max_length
+        self.truncation_mark = truncation_mark
+
+        table = get_half_width_table() if half_width else {}
+        if strip_punctuation:
+            for char in punctuation:
+                table[ord(char)] = None
+            # Full-width forms of stripped marks are stripped as well once converted
+            for code, half_width_code in list(table.items()):
+                if half_width_code is not None and chr(half_width_code) in punctuation:
+                    table[code] = None
+        self.table = table
+        self.is_identity = not table and not collapse_whitespace and max_length is None
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _normalize(self, text):
+        if self.table:
+            text = text.translate(self.table)
+        if self.collapse_whitespace:
+            text = ' '.join(text.split())
+        if self.max_length is not None and len(text) > self.max_length:
+            text = text[:max(self.max_length - len(self.truncation_mark), 0)] + self.truncation_mark
+        return text
+
+    def __call__(self, text):
+        if not isinstance(text, str):
+            # A missing value, e.g. a JSON null, leaves the placeholder empty
+            text = '' if text is None else str(text)
+        if self.is_identity:
+            return text
+        return self.normalize(text)
+
+    def get_options(self):
+        """Options the normalizer can be created again with, e.g. in a worker process"""
+        return dict(
+            strip_punctuation=self.strip_punctuation,
+            punctuation=self.punctuation,
+            half_width=self.half_width,
+            collapse_whitespace=self.collapse_whitespace,
+            max_length=self.max_length,
+            truncation_mark=self.truncation_mark,
+        )
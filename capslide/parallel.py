@@ -0,0 +1,58 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from itertools import islice
+import contextlib
+import io
+from .stats import Stats
+
+'Render slides for contiguous chunks of rows in worker processes'
+
+# Each worker process loads and validates the template once
+_worker_processor = None
+
+def _init_worker(options):
+    global _worker_processor
+    from .core import SubtitlesProcessor
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        _worker_processor = SubtitlesProcessor(**options)
+
+
+def _render_chunk(rows):
+    # The stage timers of a chunk go back to the parent with its slides
+    _worker_processor.stats = Stats()
+    return [_worker_processor.render_slide_xml(row) for row in rows], _worker_processor.stats
+
+
+def iter_chunks(rows, chunk_size):
+    """Split rows into contiguous lists of chunk_size rows"""
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def render_slides_in_parallel(rows, options, workers, chunk_size=256, stats=None):
+    """
+    Yield (matched_count, slide_xml, template slide page number) for every row, in the order of the rows.
+    options are the SubtitlesProcessor arguments each worker loads the template with.
+    The stage timers of the workers are merged into stats when given.
+    At most two chunks per worker are in flight, so rows are consumed as slides are merged.
+    """
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,)) as executor:
+        pending = deque()
+        for chunk in iter_chunks(rows, chunk_size):
+            pending.append(executor.submit(_render_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from _get_chunk_slides(pending.popleft(), stats)
+        while pending:
+            yield from _get_chunk_slides(pending.popleft(), stats)
+
+
+def _get_chunk_slides(future, stats):
+    slides, chunk_stats = future.result()
+    if stats is not None:
+        stats.merge(chunk_stats)
+    return slides
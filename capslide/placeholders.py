@@ -0,0 +1,162 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+'Precompiled index of #placeholder# tokens in a template slide'
+
+# A #name# token: any text on one line between two #, neither starting nor ending with whitespace,
+# so names like #speaker-name# or #first name# are filled like any row key
+PLACEHOLDER_PATTERN = re.compile(r'#([^#\s](?:[^#\r\n]*[^#\s])?)#')
+
+@lru_cache(maxsize=256)
+def get_placeholders_pattern(names):
+    """
+    One compiled alternation matching #name# for every name of a tuple, longest names first,
+    compiled once per key set of the rows
+    """
+    alternatives = '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(f'#({alternatives})#')
+
+
+def substitute_placeholders(text, values, pattern):
+    """
+    Replace every #name# of values in text in a single scan,
+    return the new text and the number of distinct names replaced
+    """
+    replaced_names = set()
+    def replace(match):
+        name = match.group(1)
+        replaced_names.add(name)
+        return values[name]
+    text = pattern.sub(replace, text)
+    return text, len(replaced_names)
+
+# Where a single #name# token lives in the template slide.
+# cell is a (row, column) tuple for table cells and None for text boxes.
+PlaceholderLocation = namedtuple(
+    'PlaceholderLocation',
+    ['name', 'shape_index', 'cell', 'paragraph_index', 'run_index', 'offset']
+)
+
+
+class PlaceholderRun:
+    """A template run holding one or more placeholders, split into literal text and placeholder names"""
+    __slots__ = ('path', 'text', 'segments', 'names', 'locations')
+
+    def __init__(self, path, text, locations) -> None:
+        self.path = path
+        self.text = text
+        self.locations = locations
+        self.names = tuple(dict.fromkeys(location.name for location in locations))
+
+        # Alternating literal / placeholder segments, e.g. '#B# #C#' -> ['', 'B', ' ', 'C', '']
+        segments = []
+        position = 0
+        for location in locations:
+            segments.append(text[position:location.offset])
+            segments.append(location.name)
+            position = location.offset + len(location.name) + 2
+        segments.append(text[position:])
+        self.segments = segments
+
+    def render(self, values):
+        """Build the run text, leaving placeholders without a value untouched"""
+        parts = []
+        for i, segment in enumerate(self.segments):
+            if i % 2 == 0:
+                parts.append(segment)
+            elif segment in values:
+                parts.append(values[segment])
+            else:
+                parts.append(f'#{segment}#')
+        return ''.join(parts)
+
+
+class PlaceholderIndex:
+    """
+    Locations of every #name# token in a template slide.
+    The slide is scanned once; generated slides are cloned from it, so they share the
+    same element structure and can be filled by visiting only the indexed runs.
+    """
+    def __init__(self, runs) -> None:
+        self.runs = runs
+        self.locations = [location for run in runs for location in run.locations]
+        self.names = tuple(dict.fromkeys(location.name for location in self.locations))
+
+    def __len__(self):
+        return len(self.locations)
+
+    @classmethod
+    def from_slide(cls, slide):
+        """Scan the text boxes and tables of a slide for placeholders"""
+        sp_tree = slide.shapes._spTree
+        runs = []
+
+        def scan_text_frame(text_frame, shape_index, cell):
+            for paragraph_index, paragraph in enumerate(text_frame.paragraphs):
+                for run_index, run in enumerate(paragraph.runs):
+                    text = run.text
+                    locations = [
+                        PlaceholderLocation(match.group(1), shape_index, cell, paragraph_index, run_index, match.start())
+                        for match in PLACEHOLDER_PATTERN.finditer(text)
+                    ]
+                    if locations:
+                        runs.append(PlaceholderRun(element_path(sp_tree, run._r), text, locations))
+
+        for shape_index, shape in enumerate(slide.shapes):
+            if shape.has_text_frame:
+                scan_text_frame(shape.text_frame, shape_index, None)
+            if shape.has_table:
+                for row_index, row in enumerate(shape.table.rows):
+                    for column_index, cell in enumerate(row.cells):
+                        scan_text_frame(cell.text_frame, shape_index, (row_index, column_index))
+
+        return cls(runs)
+
+    def dump(self):
+        """Plain lists and strings describing the index, load restores it"""
+        return [[list(run.path), run.text, [list(location) for location in run.locations]] for run in self.runs]
+
+    @classmethod
+    def load(cls, data):
+        runs = []
+        for path, text, locations in data:
+            locations = [
+                PlaceholderLocation(name, shape_index, tuple(cell) if cell is not None else None, paragraph_index, run_index, offset)
+                for name, shape_index, cell, paragraph_index, run_index, offset in locations
+            ]
+            runs.append(PlaceholderRun(tuple(path), text, locations))
+        return cls(runs)
+
+    def fill(self, sp_tree, values):
+        """
+        Fill the runs of a cloned shape tree with placeholder values.
+        Returns the number of (placeholder, run) pairs replaced, matching replace_placeholder_of_slide.
+        """
+        matched_count = 0
+        for run in self.runs:
+            count = sum(1 for name in run.names if name in values)
+            if count == 0:
+                continue
+            resolve_path(sp_tree, run.path).text = run.render(values)
+            matched_count += count
+        return matched_count
+
+
+def element_path(root, element):
+    """Child positions leading from root down to element"""
+    path = []
+    while element is not root:
+        parent = element.getparent()
+        path.append(parent.index(element))
+        element = parent
+    path.reverse()
+    return tuple(path)
+
+
+def resolve_path(root, path):
+    """Follow child positions from root, the inverse of element_path"""
+    element = root
+    for i in path:
+        element = element[i]
+    return element
@@ -0,0 +1,63 @@
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+
+'Drop template slides and the parts only they use from an output deck'
+
+def prune_presentation(pptx, removed_slides_count, used_layout_parts=()):
+    """
+    Remove the first removed_slides_count slides, then every layout no remaining slide uses
+    and every master left without layouts. Only the references are removed: python-pptx writes
+    the parts reachable from the package, so the slides, notes, images and layouts nothing
+    refers to anymore are left out of the saved deck.
+    used_layout_parts are kept as well, e.g. the layout of slides written by another engine.
+    Return the number of removed slides, layouts and masters.
+    """
+    presentation_part = pptx.part
+    sld_id_lst = pptx.slides._sldIdLst
+    removed_slides = list(sld_id_lst)[:removed_slides_count]
+    for sld_id in removed_slides:
+        sld_id_lst.remove(sld_id)
+        presentation_part.drop_rel(sld_id.rId)
+
+    used_layout_parts = set(used_layout_parts)
+    for slide in pptx.slides:
+        used_layout_parts.add(slide.part.part_related_by(RT.SLIDE_LAYOUT))
+
+    removed_layouts_count = 0
+    sld_master_id_lst = pptx.slide_masters._sldMasterIdLst
+    removed_masters = []
+    for sld_master_id in list(sld_master_id_lst):
+        master_part = presentation_part.related_part(sld_master_id.rId)
+        sld_layout_id_lst = master_part.slide_master.slide_layouts._sldLayoutIdLst
+        for sld_layout_id in list(sld_layout_id_lst):
+            if master_part.related_part(sld_layout_id.rId) in used_layout_parts:
+                continue
+            sld_layout_id_lst.remove(sld_layout_id)
+            master_part.drop_rel(sld_layout_id.rId)
+            removed_layouts_count += 1
+        if len(sld_layout_id_lst) == 0:
+            removed_masters.append(sld_master_id)
+
+    # A deck needs at least one master, even when it has no slides
+    if len(removed_masters) == len(sld_master_id_lst):
+        removed_masters = removed_masters[1:]
+    for sld_master_id in removed_masters:
+        sld_master_id_lst.remove(sld_master_id)
+        presentation_part.drop_rel(sld_master_id.rId)
+
+    return len(removed_slides), removed_layouts_count, len(removed_masters)
+
+
+def iter_related_parts(part, excluded_reltypes=()):
+    """Parts reachable from a part through its relationships, skipping the excluded relationship types"""
+    visited = set([part])
+    stack = [part]
+    while stack:
+        for rel in stack.pop().rels.values():
+            if rel.is_external or rel.reltype in excluded_reltypes:
+                continue
+            target_part = rel.target_part
+            if target_part in visited:
+                continue
+            visited.add(target_part)
+            stack.append(target_part)
+            yield target_part
@@ -0,0 +1,119 @@
+from collections.abc import Mapping
+import sys
+
+'Compact column-wise storage of subtitle rows'
+
+class _Missing:
+    """Value of a column for rows without that key"""
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'MISSING'
+
+MISSING = _Missing()
+
+
+class RowStore:
+    """
+    Rows kept column by column: every placeholder name is interned and stored once,
+    with one list of values per name, instead of one dict repeating the keys per row.
+    Rows are read back as RowView mappings, which is all a placeholder index needs to fill a slide.
+    """
+    def __init__(self, names=()) -> None:
+        self.names = []
+        self.positions = {}
+        self.columns = []
+        self.length = 0
+        # Columns of the caller, copied before the first row is appended to them
+        self._borrowed = False
+        for name in names:
+            self._add_column(name)
+
+    @classmethod
+    def from_rows(cls, rows):
+        store = cls()
+        for row in rows:
+            store.append(row)
+        return store
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        A store over pre-built columns, a mapping of placeholder name -> sequence of values.
+        The sequences are used as they are, they are only copied if rows are appended later.
+        """
+        store = cls()
+        lengths = set(len(values) for values in columns.values())
+        if len(lengths) > 1:
+            raise ValueError(f'Columns must have the same length, got lengths {sorted(lengths)}')
+        for name, values in columns.items():
+            store._add_column(name, values)
+        store.length = lengths.pop() if lengths else 0
+        store._borrowed = True
+        return store
+
+    def _add_column(self, name, values=None):
+        name = sys.intern(name)
+        self.positions[name] = len(self.names)
+        self.names.append(name)
+        self.columns.append([MISSING] * self.length if values is None else values)
+
+    def append(self, row):
+        """Add a row, keys not seen before become new columns"""
+        if self._borrowed:
+            self.columns = [list(values) for values in self.columns]
+            self._borrowed = False
+        for name in row:
+            if name not in self.positions:
+                self._add_column(name)
+        for name, values in zip(self.names, self.columns):
+            values.append(row.get(name, MISSING))
+        self.length += 1
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('row index out of range')
+        return RowView(self, index)
+
+    def __iter__(self):
+        for index in range(self.length):
+            yield RowView(self, index)
+
+
+class RowView(Mapping):
+    """Read-only mapping of placeholder name -> value over one row of a RowStore"""
+    __slots__ = ('store', 'index')
+
+    def __init__(self, store, index) -> None:
+        self.store = store
+        self.index = index
+
+    def __getitem__(self, name):
+        position = self.store.positions.get(name)
+        if position is None:
+            raise KeyError(name)
+        value = self.store.columns[position][self.index]
+        if value is MISSING:
+            raise KeyError(name)
+        return value
+
+    def __iter__(self):
+        index = self.index
+        for name, values in zip(self.store.names, self.store.columns):
+            if values[index] is not MISSING:
+                yield name
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f'RowView({dict(self)!r})'
+
+    def __reduce__(self):
+        # Rows sent to worker processes are plain dicts, not the whole store
+        return dict, (dict(self),)
@@ -0,0 +1,168 @@
+from concurrent.futures import ProcessPoolExecutor
+import base64
+import io
+import json
+import os
+import socket
+import socketserver
+from .core import SubtitlesProcessor, CapSlideError
+
+'Long-running render daemon keeping templates warm'
+
+# Per worker process: registered template paths, processor options and warm processors
+_template_paths = {}
+_options = {}
+_processors = {}
+# Directory job outputs are written under, None when decks are only returned
+_output_dir = None
+
+def _init_worker(template_paths, options, output_dir):
+    global _output_dir
+    _output_dir = output_dir
+    _template_paths.update(template_paths)
+    _options.update(options)
+    # Validate every registered template up front so the first jobs do not pay for it
+    for template_id in template_paths:
+        get_processor(template_id, 0)
+
+
+def get_processor(template_id, template_slide_page_number):
+    """Warm processor of a registered template, validated on first use"""
+    key = (template_id, template_slide_page_number)
+    if key not in _processors:
+        if template_id not in _template_paths:
+            raise CapSlideError(f'Unknown template id {template_id}')
+        _processors[key] = SubtitlesProcessor(
+            output_path=os.devnull,
+            template_path=_template_paths[template_id],
+            template_slide_page_number=template_slide_page_number,
+            **_options
+        )
+    return _processors[key]
+
+
+def get_job_output_path(output, output_dir):
+    """
+    Absolute path of a job output, relative to the output directory of the server.
+    Clients can only write below that directory: absolute paths, and paths leaving it
+    through .. or symbolic links, are rejected.
+    """
+    if output_dir is None:
+        raise CapSlideError('This server does not write files, send the job without an output to receive the deck')
+    if os.path.isabs(output):
+        raise CapSlideError(f'Output {output} must be relative to the output directory of the server')
+    output_dir = os.path.realpath(output_dir)
+    output_path = os.path.realpath(os.path.join(output_dir, output))
+    if output_path == output_dir or os.path.commonpath([output_path, output_dir]) != output_dir:
+        raise CapSlideError(f'Output {output} is outside the output directory of the server')
+    return output_path
+
+
+def render_job(job):
+    """
+    Render one job in a worker process and return the response.
+    A job holds a template id, either rows (placeholder -> text) or lines for the default placeholder,
+    and optionally an output path within the output directory of the server.
+    Without an output path the deck is returned base64 encoded.
+    """
+    try:
+        output_path = job.get('output')
+        if output_path:
+            output_path = get_job_output_path(output_path, _output_dir)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+        processor = get_processor(job['template'], job.get('template_slide_page_number', 0))
+
+        if 'rows' in job:
+            rows = job['rows']
+        else:
+            rows = ({processor.placeholder: line.strip()} for line in job['lines'] if line.strip())
+
+        output = output_path if output_path else io.BytesIO()
+        render_processor = processor.spawn(output)
+        matched_count, slides_count = render_processor.append_slides_with_rows(rows)
+        render_processor.save()
+    except Exception as e:
+        return {'status': 'error', 'error': f'{type(e).__name__}: {e}'}
+
+    response = {'status': 'ok', 'matched_count': matched_count, 'slides_count': slides_count}
+    if output_path:
+        response['output'] = render_processor.output_path
+    else:
+        response['data'] = base64.b64encode(output.getvalue()).decode('ascii')
+    return response
+
+
+class RenderRequestHandler(socketserver.StreamRequestHandler):
+    """Reads one JSON job per line and answers each with one JSON line"""
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                job = json.loads(line)
+            except ValueError as e:
+                response = {'status': 'error', 'error': f'Invalid job: {e}'}
+            else:
+                response = self.server.executor.submit(render_job, job).result()
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class RenderServer:
+    """
+    Accepts render jobs on a local Unix socket or a localhost TCP port.
+    Connections are served concurrently and jobs run on a bounded pool of worker processes,
+    each of which keeps the registered templates validated in memory.
+    Jobs can only write their outputs below output_dir; without it, decks are only returned.
+    """
+    def __init__(self, template_paths, workers=None, output_dir=None, **options) -> None:
+        self.template_paths = dict(template_paths)
+        self.output_dir = os.path.abspath(output_dir) if output_dir is not None else None
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_init_worker,
+            initargs=(self.template_paths, options, self.output_dir)
+        )
+        self.server = None
+
+    def bind(self, socket_path=None, port=None, host='127.0.0.1'):
+        """Listen on socket_path when given, otherwise on host:port"""
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.server = socketserver.ThreadingUnixStreamServer(socket_path, RenderRequestHandler)
+        else:
+            self.server = socketserver.ThreadingTCPServer((host, port), RenderRequestHandler)
+        self.server.daemon_threads = True
+        self.server.executor = self.executor
+        return self.server.server_address
+
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        """Stop serve_forever from another thread"""
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+        if self.server.address_family == getattr(socket, 'AF_UNIX', None) and os.path.exists(self.server.server_address):
+            os.remove(self.server.server_address)
+        self.executor.shutdown()
+
+
+def send_job(job, socket_path=None, port=None, host='127.0.0.1'):
+    """Send a job to a running server and return its response"""
+    if socket_path is not None:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+    else:
+        connection = socket.create_connection((host, port))
+    with connection, connection.makefile('rwb') as f:
+        f.write(json.dumps(job, ensure_ascii=False).encode('utf-8') + b'\n')
+        f.flush()
+        return json.loads(f.readline())
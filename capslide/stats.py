@@ -0,0 +1,82 @@
+from collections import defaultdict
+from contextlib import contextmanager
+import json
+import sys
+import time
+
+'Stage timers, counters and progress reporting'
+
+class Stats:
+    """
+    Counters and timers of the processing stages: load, clone, replace, write and save.
+    Hooks registered with add_hook are called as hook(stage, seconds) after every timed stage,
+    which is the place to plug a profiler or a metrics client in.
+    """
+    def __init__(self) -> None:
+        self.timers = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = defaultdict(int)
+        self.hooks = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - start)
+
+    def add_time(self, stage, seconds):
+        self.timers[stage] += seconds
+        self.calls[stage] += 1
+        for hook in self.hooks:
+            hook(stage, seconds)
+
+    def count(self, name, value=1):
+        self.counters[name] += value
+
+    def merge(self, other):
+        """Add the numbers of another Stats, e.g. of every job of a batch"""
+        for stage, seconds in other.timers.items():
+            self.timers[stage] += seconds
+        for stage, calls in other.calls.items():
+            self.calls[stage] += calls
+        for name, value in other.counters.items():
+            self.counters[name] += value
+
+    def as_dict(self):
+        return {
+            'timers': {stage: {'seconds': seconds, 'calls': self.calls[stage]} for stage, seconds in self.timers.items()},
+            'counters': dict(self.counters),
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict(), indent=2)
+
+
+class ProgressReporter:
+    """Reports the number of added pages at most once per interval seconds"""
+    def __init__(self, interval=1.0, stream=None) -> None:
+        self.interval = interval
+        self.stream = stream
+        self.last_report = None
+        self.page_count = 0
+        self.matched_count = 0
+
+    def update(self, page_count, matched_count, last_matched_count):
+        self.page_count = page_count
+        self.matched_count = matched_count
+        now = time.monotonic()
+        if self.interval <= 0:
+            self._write(f'Successfully added page {page_count}! {last_matched_count} subtitle(s) inserted.')
+        elif self.last_report is None or now - self.last_report >= self.interval:
+            self._write(f'Added {page_count} page(s), {matched_count} subtitle(s) inserted so far...')
+        else:
+            return
+        self.last_report = now
+
+    def _write(self, message):
+        print(message, file=self.stream or sys.stdout)
@@ -0,0 +1,96 @@
+import json
+import re
+
+'Helpers for reading subtitle rows'
+
+WHITESPACE = re.compile(r'\s*')
+
+def iter_json_rows(f, chunk_size=1 << 16):
+    """
+    Yield rows one at a time from an open JSON file.
+    A top-level array is decoded incrementally, anything else is read as NDJSON (one row per line).
+    """
+    head = f.read(chunk_size)
+    start = WHITESPACE.match(head).end()
+    # The first value decides the parser, however much whitespace comes before it
+    while start == len(head):
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        head += chunk
+        start = WHITESPACE.match(head, start).end()
+    if head[start:start + 1] == '[':
+        return iter_json_array(f, chunk_size, head)
+    return iter_ndjson(f, head)
+
+
+def iter_ndjson(f, head=''):
+    """Yield one decoded value per non-empty line"""
+    if head:
+        lines = head.splitlines(keepends=True)
+        # The last line of the first chunk may continue in the file
+        if not lines[-1].endswith('\n'):
+            lines[-1] += f.readline()
+    else:
+        lines = []
+
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(f, chunk_size=1 << 16, head=''):
+    """Yield the items of a top-level JSON array without decoding the whole array at once"""
+    decoder = json.JSONDecoder()
+    buffer = head
+    pos = 0
+    eof = False
+    started = False
+    expect_value = True
+    items_count = 0
+
+    while True:
+        pos = WHITESPACE.match(buffer, pos).end()
+
+        if pos == len(buffer) or (expect_value and started and buffer[pos] != ']'):
+            # Decode the next item, reading more of the file until it is complete
+            if pos < len(buffer):
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                    # A number at the very end of the buffer may continue in the next chunk
+                    if end < len(buffer) or eof:
+                        yield value
+                        items_count += 1
+                        pos = end
+                        expect_value = False
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                raise json.JSONDecodeError('Unexpected end of JSON array', buffer, pos)
+
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            # Drop what has been consumed so the buffer only holds the current item
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != '[':
+                raise json.JSONDecodeError('Expecting a JSON array', buffer, pos)
+            started = True
+        elif char == ']' and (not expect_value or items_count == 0):
+            return
+        elif char == ',' and not expect_value:
+            expect_value = True
+        elif expect_value:
+            raise json.JSONDecodeError('Expecting value', buffer, pos)
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+        pos += 1
@@ -0,0 +1,129 @@
+from copy import deepcopy
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import CT_Relationships, serialize_part_xml
+from pptx.opc.packuri import PackURI, CONTENT_TYPES_URI, PACKAGE_URI
+from pptx.opc.serialized import _ContentTypesItem
+from .prune import iter_related_parts
+from .zipwriter import PackageZipWriter
+
+'Write generated slides straight into the output zip'
+
+class StreamingPptxWriter:
+    """
+    Output engine that writes every slide into the output zip as soon as it is generated.
+    The parts of the template are written when the writer is opened, presentation.xml with
+    the final slide list, its relationships and the content types are written by close().
+    Only the template presentation stays in memory, however many slides are added.
+    zip_options are passed on to PackageZipWriter, e.g. compression and compress_level.
+    """
+    def __init__(self, file, pptx, template_slide, **zip_options) -> None:
+        self.presentation_part = pptx.part
+        self.package = pptx.part.package
+        self.parts = list(self.package.iter_parts())
+        self.partnames = set(str(part.partname) for part in self.parts)
+        self.slide_partnames = []
+        self.closed = False
+        self.template_slide = template_slide
+        # Relationships XML of the generated slides, by template slide part
+        self.slide_rels_xml = {}
+        self.removed_rIds = set()
+
+        self.partname_numbers = (
+            n for n in range(1, len(self.partnames) + 2 ** 31)
+            if f'/ppt/slides/slide{n}.xml' not in self.partnames
+        )
+
+        self.zip = PackageZipWriter(file, **zip_options)
+        self.zip.writestr(PACKAGE_URI.rels_uri.membername, self.package._rels.xml)
+        for part in self.parts:
+            if part is self.presentation_part:
+                continue
+            self._write_part(part)
+        self.add_template_slide(template_slide)
+
+    def __len__(self):
+        return len(self.slide_partnames)
+
+    def _write_part(self, part):
+        self.zip.writestr(part.partname.membername, part.blob)
+        if part._rels:
+            self.zip.writestr(part.partname.rels_uri.membername, part.rels.xml)
+
+    def add_template_slide(self, template_slide):
+        """Prepare the relationships of the slides generated from a template slide, return their XML"""
+        slide_part = template_slide.part
+        if slide_part in self.slide_rels_xml:
+            return self.slide_rels_xml[slide_part]
+
+        # Generated slides share the relationships of the template slide, except its notes
+        rels = CT_Relationships.new()
+        for rel in slide_part.rels.values():
+            if rel.reltype != RT.NOTES_SLIDE:
+                rels.add_rel(rel.rId, rel.reltype, rel.target_ref, rel.is_external)
+        self.slide_rels_xml[slide_part] = rels.xml_file_bytes
+
+        # As in SubtitlesProcessor.save, template slides are dropped from the slide list
+        self.removed_rIds.update(
+            rId for rId, rel in self.presentation_part.rels.items()
+            if not rel.is_external and rel.target_part is slide_part
+        )
+
+        # The parts the template slide refers to (layout, images...) are not reachable from
+        # the package anymore when the template slides are pruned, they are written here.
+        # Masters are always part of the package, through them every layout would be written again.
+        for part in iter_related_parts(slide_part, (RT.NOTES_SLIDE, RT.SLIDE, RT.SLIDE_MASTER)):
+            partname = str(part.partname)
+            if partname not in self.partnames:
+                self.partnames.add(partname)
+                self.parts.append(part)
+                self._write_part(part)
+        return self.slide_rels_xml[slide_part]
+
+    def add_slide(self, slide_xml, template_slide=None):
+        """
+        Write the XML bytes of a slide and its relationships, return the slide partname.
+        template_slide is the slide it was generated from, the template slide of the writer by default.
+        """
+        slide_rels_xml = self.add_template_slide(template_slide or self.template_slide)
+        partname = PackURI(f'/ppt/slides/slide{next(self.partname_numbers)}.xml')
+        self.zip.writestr(partname.membername, slide_xml)
+        self.zip.writestr(partname.rels_uri.membername, slide_rels_xml)
+        self.slide_partnames.append(partname)
+        return partname
+
+    def close(self):
+        """Write the slide list, relationships and content types, then close the zip"""
+        if self.closed:
+            return
+        self.closed = True
+
+        presentation = deepcopy(self.presentation_part._element)
+        sld_id_lst = presentation.get_or_add_sldIdLst()
+        for sld_id in list(sld_id_lst):
+            if sld_id.rId in self.removed_rIds:
+                sld_id_lst.remove(sld_id)
+        next_slide_id = max([255] + [int(sld_id.get('id')) for sld_id in sld_id_lst]) + 1
+
+        rels = CT_Relationships.new()
+        for rel in self.presentation_part.rels.values():
+            rels.add_rel(rel.rId, rel.reltype, rel.target_ref, rel.is_external)
+        used_rIds = set(self.presentation_part.rels.keys())
+        rId_number = len(used_rIds)
+
+        content_types = _ContentTypesItem.xml_for(self.parts)
+        base_uri = self.presentation_part.partname.baseURI
+
+        for slide_id, partname in enumerate(self.slide_partnames, next_slide_id):
+            rId_number += 1
+            while f'rId{rId_number}' in used_rIds:
+                rId_number += 1
+            rId = f'rId{rId_number}'
+            rels.add_rel(rId, RT.SLIDE, partname.relative_ref(base_uri))
+            sld_id_lst._add_sldId(id=slide_id, rId=rId)
+            content_types.add_override(partname, CT.PML_SLIDE)
+
+        partname = self.presentation_part.partname
+        self.zip.writestr(partname.membername, serialize_part_xml(presentation))
+        self.zip.writestr(partname.rels_uri.membername, rels.xml_file_bytes)
+        self.zip.writestr(CONTENT_TYPES_URI.membername, serialize_part_xml(content_types))
+        self.zip.close()
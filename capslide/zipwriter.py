@@ -0,0 +1,191 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import os
+import struct
+import time
+import zlib
+from pptx.opc.oxml import serialize_part_xml
+from pptx.opc.packuri import CONTENT_TYPES_URI, PACKAGE_URI
+from pptx.opc.serialized import _ContentTypesItem
+
+'Zip writer compressing package parts on a thread pool'
+
+COMPRESSIONS = ('deflate', 'stored')
+DEFAULT_COMPRESS_LEVEL = 6
+# Media formats that are compressed already, deflating them again only costs time
+STORED_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.mp3', '.mp4', '.m4a', '.m4v', '.wmv', '.avi', '.mov')
+# Smaller parts are compressed inline, handing them to a thread costs more than it saves
+PARALLEL_MIN_SIZE = 16 * 1024
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+# Values of the classic fields whose actual value is in a zip64 field
+ZIP64_MARKER = 0xFFFFFFFF
+ZIP64_COUNT_MARKER = 0xFFFF
+
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+UTF8_FLAG = 0x800
+LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<IHHHHHHIIIHHHHHII')
+ZIP64_END_RECORD = struct.Struct('<IQHHIIQQQQ')
+ZIP64_END_LOCATOR = struct.Struct('<IIQI')
+END_RECORD = struct.Struct('<IHHHHIIH')
+
+def get_default_workers():
+    return min(4, os.cpu_count() or 1)
+
+
+def check_zip_options(compression, compress_level):
+    """Raise ValueError for options zlib would only reject once the first part is compressed"""
+    if compression not in COMPRESSIONS:
+        raise ValueError(f'Unknown compression {compression}, expected one of {", ".join(COMPRESSIONS)}')
+    if compress_level != -1 and not 0 <= compress_level <= 9:
+        raise ValueError(f'Invalid compress level {compress_level}, expected 0 to 9 or -1 for the zlib default')
+
+
+def compress(data, method, level):
+    """Return (crc32, uncompressed size, compressed bytes) of an entry"""
+    if method == ZIP_DEFLATED:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        compressed = compressor.compress(data) + compressor.flush()
+    else:
+        compressed = data
+    return zlib.crc32(data), len(data), compressed
+
+
+class PackageZipWriter:
+    """
+    Writes zip entries in order to a path or to any binary stream, stdout included:
+    every entry is compressed before its header is written, so the stream is never sought.
+    Entries above PARALLEL_MIN_SIZE are deflated on a thread pool, zlib releases the GIL
+    while compressing, and written as soon as the entries before them are.
+    Zip64 records are added when the archive outgrows the classic zip limits.
+    """
+    def __init__(self, file, compression='deflate', compress_level=DEFAULT_COMPRESS_LEVEL, workers=None) -> None:
+        check_zip_options(compression, compress_level)
+        self.method = ZIP_DEFLATED if compression == 'deflate' else ZIP_STORED
+        self.compress_level = compress_level
+        self.workers = get_default_workers() if workers is None else workers
+        self.executor = None
+        if self.method == ZIP_DEFLATED and self.workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        self.own_file = isinstance(file, (str, os.PathLike))
+        self.file = open(file, 'wb') if self.own_file else file
+        self.offset = 0
+        self.entries = []
+        self.pending = deque()
+        self.closed = False
+
+        now = time.localtime()
+        self.dos_time = (now.tm_hour << 11) | (now.tm_min << 5) | (now.tm_sec // 2)
+        self.dos_date = ((max(now.tm_year, 1980) - 1980) << 9) | (now.tm_mon << 5) | now.tm_mday
+
+    def writestr(self, name, data):
+        """Queue an entry, name is the member name within the archive"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        method = ZIP_STORED if name.lower().endswith(STORED_EXTENSIONS) else self.method
+        if self.executor is not None and method == ZIP_DEFLATED and len(data) >= PARALLEL_MIN_SIZE:
+            self.pending.append((name, method, self.executor.submit(compress, data, method, self.compress_level)))
+        else:
+            self.pending.append((name, method, compress(data, method, self.compress_level)))
+        self._write_pending(self.workers * 4)
+
+    def _write_pending(self, max_pending):
+        """Write the finished entries at the head of the queue, waiting while more than max_pending are queued"""
+        while self.pending:
+            name, method, result = self.pending[0]
+            if not isinstance(result, tuple):
+                if len(self.pending) <= max_pending and not result.done():
+                    return
+                result = result.result()
+            self.pending.popleft()
+            self._write_entry(name, method, *result)
+
+    def _write_entry(self, name, method, crc, size, compressed):
+        name_bytes = name.encode('utf-8')
+        compressed_size = len(compressed)
+        zip64 = size >= ZIP64_LIMIT or compressed_size >= ZIP64_LIMIT
+        extra = struct.pack('<HHQQ', 1, 16, size, compressed_size) if zip64 else b''
+        self.file.write(LOCAL_HEADER.pack(
+            0x04034b50, 45 if zip64 else 20, UTF8_FLAG, method, self.dos_time, self.dos_date, crc,
+            ZIP64_MARKER if zip64 else compressed_size, ZIP64_MARKER if zip64 else size,
+            len(name_bytes), len(extra)
+        ))
+        self.file.write(name_bytes)
+        self.file.write(extra)
+        self.file.write(compressed)
+        self.entries.append((name_bytes, method, crc, size, compressed_size, self.offset))
+        self.offset += LOCAL_HEADER.size + len(name_bytes) + len(extra) + compressed_size
+
+    def _write_central_directory(self):
+        central_directory_offset = self.offset
+        for name_bytes, method, crc, size, compressed_size, offset in self.entries:
+            # Only the fields that overflow move to the zip64 extra field, in this order
+            zip64_fields = [value for value in (size, compressed_size, offset) if value >= ZIP64_LIMIT]
+            extra = struct.pack(f'<HH{len(zip64_fields)}Q', 1, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b''
+            version = 45 if zip64_fields else 20
+            header = CENTRAL_HEADER.pack(
+                0x02014b50, version, version, UTF8_FLAG, method, self.dos_time, self.dos_date, crc,
+                ZIP64_MARKER if compressed_size >= ZIP64_LIMIT else compressed_size,
+                ZIP64_MARKER if size >= ZIP64_LIMIT else size,
+                len(name_bytes), len(extra), 0, 0, 0, 0o644 << 16,
+                ZIP64_MARKER if offset >= ZIP64_LIMIT else offset
+            )
+            self.file.write(header)
+            self.file.write(name_bytes)
+            self.file.write(extra)
+            self.offset += len(header) + len(name_bytes) + len(extra)
+        central_directory_size = self.offset - central_directory_offset
+
+        entries_count = len(self.entries)
+        zip64 = entries_count >= ZIP64_COUNT_LIMIT or central_directory_offset >= ZIP64_LIMIT or central_directory_size >= ZIP64_LIMIT
+        if zip64:
+            self.file.write(ZIP64_END_RECORD.pack(
+                0x06064b50, ZIP64_END_RECORD.size - 12, 45, 45, 0, 0,
+                entries_count, entries_count, central_directory_size, central_directory_offset
+            ))
+            self.file.write(ZIP64_END_LOCATOR.pack(0x07064b50, 0, self.offset, 1))
+        self.file.write(END_RECORD.pack(
+            0x06054b50, 0, 0,
+            ZIP64_COUNT_MARKER if zip64 else entries_count, ZIP64_COUNT_MARKER if zip64 else entries_count,
+            ZIP64_MARKER if zip64 else central_directory_size, ZIP64_MARKER if zip64 else central_directory_offset, 0
+        ))
+
+    def close(self):
+        """Write the remaining entries and the central directory"""
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._write_pending(0)
+            self._write_central_directory()
+            self.file.flush()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown()
+            if self.own_file:
+                self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_package(package, file, blobs=None, **options):
+    """
+    Save a python-pptx package like Package.save does, through a PackageZipWriter.
+    blobs maps parts to the bytes written instead of their own, leaving the package untouched.
+    """
+    parts = tuple(package.iter_parts())
+    blobs = blobs or {}
+    with PackageZipWriter(file, **options) as writer:
+        writer.writestr(CONTENT_TYPES_URI.membername, serialize_part_xml(_ContentTypesItem.xml_for(parts)))
+        writer.writestr(PACKAGE_URI.rels_uri.membername, package._rels.xml)
+        for part in parts:
+            writer.writestr(part.partname.membername, blobs[part] if part in blobs else part.blob)
+            if part._rels:
+                writer.writestr(part.partname.rels_uri.membername, part.rels.xml)
@@ -0,0 +1,5 @@
+from .registry import register_reader, get_reader, get_reader_extensions, READERS
+# Modules registering the built-in readers
+from .text import read_json_rows, read_text_rows
+from .cues import read_srt_rows, read_vtt_rows
+from .delimited import read_csv_rows, read_tsv_rows
@@ -0,0 +1,78 @@
+import re
+from .registry import register_reader
+
+'Readers of SRT and WebVTT subtitle files, one row per cue'
+
+TIMING_SEPARATOR = '-->'
+VTT_VOICE = re.compile(r'<v(?:\.[\w.-]+)?\s+([^>]+)>')
+VTT_TAG = re.compile(r'<[^>]*>')
+
+def iter_blocks(f):
+    """Lines of the blocks of a file separated by blank lines, read one line at a time"""
+    block = []
+    for line in f:
+        line = line.rstrip('\r\n')
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def parse_cue(block):
+    """Split a cue block into (identifier, start, end, settings, text lines), None without a timing line"""
+    for i, line in enumerate(block[:2]):
+        if TIMING_SEPARATOR in line:
+            start, _, end = line.partition(TIMING_SEPARATOR)
+            end, _, settings = end.strip().partition(' ')
+            identifier = block[0].strip() if i == 1 else ''
+            return identifier, start.strip(), end, settings.strip(), block[i + 1:]
+    return None
+
+
+@register_reader('.srt')
+def read_srt_rows(path, placeholder):
+    """
+    Rows of the cues of an SRT file: the text fills the placeholder, the cue number,
+    start and end times fill the index, start and end placeholders.
+    Lines of multi-line cues are joined with a space.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for block in iter_blocks(f):
+            cue = parse_cue(block)
+            if cue is None:
+                continue
+            identifier, start, end, settings, lines = cue
+            yield {
+                placeholder: ' '.join(line.strip() for line in lines),
+                'index': identifier,
+                'start': start,
+                'end': end,
+            }
+
+
+@register_reader('.vtt')
+def read_vtt_rows(path, placeholder):
+    """
+    Rows of the cues of a WebVTT file, like read_srt_rows. The voice of a <v Speaker> tag
+    fills the speaker placeholder, other tags are dropped. Header, NOTE, STYLE and REGION blocks are skipped.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for block in iter_blocks(f):
+            if block[0].startswith(('WEBVTT', 'NOTE', 'STYLE', 'REGION')) and TIMING_SEPARATOR not in block[0]:
+                continue
+            cue = parse_cue(block)
+            if cue is None:
+                continue
+            identifier, start, end, settings, lines = cue
+            text = ' '.join(line.strip() for line in lines)
+            voice = VTT_VOICE.search(text)
+            yield {
+                placeholder: VTT_TAG.sub('', text).strip(),
+                'index': identifier,
+                'start': start,
+                'end': end,
+                'speaker': voice.group(1).strip() if voice else '',
+            }
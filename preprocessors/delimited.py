@@ -0,0 +1,20 @@
+import csv
+from .registry import register_reader
+
+'Readers of CSV and TSV subtitle files, one row per record'
+
+def iter_delimited_rows(path, delimiter):
+    """The header names the placeholders the columns fill, empty column names are skipped"""
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        for record in csv.DictReader(f, delimiter=delimiter):
+            yield {name: value for name, value in record.items() if name and value is not None}
+
+
+@register_reader('.csv')
+def read_csv_rows(path, placeholder):
+    return iter_delimited_rows(path, ',')
+
+
+@register_reader('.tsv', '.tab')
+def read_tsv_rows(path, placeholder):
+    return iter_delimited_rows(path, '\t')
@@ -0,0 +1,23 @@
+import os.path
+
+'Registry of the subtitle file readers, by file extension'
+
+# extension -> reader(path, placeholder) generating rows (placeholder -> text)
+READERS = {}
+
+def register_reader(*extensions):
+    """Decorator registering a reader for file extensions, later registrations win"""
+    def decorator(reader):
+        for extension in extensions:
+            READERS[extension.lower()] = reader
+        return reader
+    return decorator
+
+
+def get_reader(path):
+    """Reader of a file by its extension, None when no reader is registered for it"""
+    return READERS.get(os.path.splitext(path)[1].lower())
+
+
+def get_reader_extensions():
+    return tuple(READERS)
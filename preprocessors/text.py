@@ -0,0 +1,20 @@
+from capslide.utils import iter_json_rows
+from .registry import register_reader
+
+'Readers of JSON, NDJSON and plain text subtitle files'
+
+@register_reader('.json', '.ndjson', '.jsonl')
+def read_json_rows(path, placeholder):
+    """Rows of a JSON array or of one JSON object per line, decoded one at a time"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        yield from iter_json_rows(f)
+
+
+@register_reader('.txt')
+def read_text_rows(path, placeholder):
+    """One row per non-empty line, filling the placeholder"""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield {placeholder: line}
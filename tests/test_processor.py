@@ -1,7 +1,11 @@
 from capslide import *
+from capslide.utils import iter_json_rows
 import os.path
 import pytest
 import json
+import io
+import time
+from pptx import Presentation
 
 base_dir = os.path.dirname(os.path.abspath(__file__))
 templates_dir = os.path.join(base_dir, 'templates')
@@ -207,3 +211,916 @@ def test_subtitles_processor_file2():
     assert matched_count == 15
     assert slides_count == 3    
 
+
+def test_placeholder_index():
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest8.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    index = processor.placeholder_index
+    assert len(index) == processor.get_placeholders_count(processor.template_slide) == 5
+    assert index.names == ('A', 'B', 'C')
+    assert [(loc.name, loc.cell, loc.offset) for loc in index.locations] == [
+        ('A', (0, 0), 0), ('B', (1, 0), 0), ('C', (1, 0), 3), ('B', (2, 0), 0), ('C', (2, 0), 4)
+    ]
+
+    row = {'A': '这是字幕1', 'C': '这是字幕3'}
+    assert processor.append_slide_with_row(row) == 3
+    new_slide = processor.output_pptx.slides[-1]
+    cells = [row.cells[0] for row in new_slide.shapes[0].table.rows]
+    assert [cell.text for cell in cells] == ['这是字幕1', '#B#这是字幕3', '#B# 这是字幕3']
+
+def test_duplicate_slide_prototype():
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest9.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=4,
+    )
+    slides_count = len(processor.output_pptx.slides)
+    new_slides = [processor.duplicate_slide(processor.template_slide) for _ in range(3)]
+    assert processor.get_blank_slide_layout() is processor.get_blank_slide_layout()
+    assert len(processor.output_pptx.slides) == slides_count + 3
+
+    slide_ids = [slide.slide_id for slide in processor.output_pptx.slides]
+    assert len(set(slide_ids)) == len(slide_ids)
+    partnames = [slide.part.partname for slide in processor.output_pptx.slides]
+    assert len(set(partnames)) == len(partnames)
+
+    # Every clone gets its own copy of the template shape tree
+    for new_slide in new_slides:
+        assert processor.get_placeholders_count(new_slide) == 3
+    assert processor.replace_placeholder_of_slide(new_slides[0], 'A', '这是字幕1') == 1
+    assert processor.get_placeholders_count(new_slides[1], 'A') == 1
+    assert processor.get_placeholders_count(processor.template_slide, 'A') == 1
+
+    new_slide = processor.duplicate_slide(processor.get_slide_by_page_number(processor.template_pptx, 5))
+    assert processor.get_placeholders_count(new_slide) == 4
+    processor.save()
+
+
+def test_iter_json_rows():
+    with open(get_data_file_path('sample1.json'), encoding='utf-8') as f:
+        rows = json.load(f)
+    text = json.dumps(rows, indent=4, ensure_ascii=False)
+    # Tiny chunks force rows to be split across reads
+    for chunk_size in (1, 5, 1 << 16):
+        assert list(iter_json_rows(io.StringIO(text), chunk_size)) == rows
+    with open(get_data_file_path('sample3.ndjson'), encoding='utf-8') as f:
+        assert list(iter_json_rows(f, 5)) == rows
+
+    assert list(iter_json_rows(io.StringIO(' [ ] '))) == []
+    # Leading whitespace longer than a chunk does not hide the array
+    assert list(iter_json_rows(io.StringIO('\n' * 20 + text), 5)) == rows
+    assert list(iter_json_rows(io.StringIO(' ' * 20), 5)) == []
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_rows(io.StringIO('[{"A": "1"},]')))
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_json_rows(io.StringIO('[{"A": "1"}')))
+
+
+def test_subtitles_processor_ndjson_file():
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest10.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    file_path = get_data_file_path('sample3.ndjson')
+
+    matched_count, slides_count = processor.append_slides_from_file(file_path)
+    processor.save()
+    assert matched_count == 15
+    assert slides_count == 3
+
+
+def test_subtitles_processor_streaming():
+    output_path = get_output_file_path('dest11.pptx')
+    processor = SubtitlesProcessor(
+        output_path=output_path,
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=True,
+    )
+    matched_count, slides_count = processor.append_slides_from_file(get_data_file_path('sample1.json'))
+    processor.save()
+    assert matched_count == 15
+    assert slides_count == 3
+
+    # The template itself is left untouched, the slides only exist in the output file
+    assert len(processor.output_pptx.slides) == 7
+    output_pptx = Presentation(output_path)
+    assert len(output_pptx.slides) == 6 + 3
+    last_slide = output_pptx.slides[-1]
+    assert [row.cells[0].text for row in last_slide.shapes[0].table.rows] == ['这是字幕A7', '这是字幕8这是字幕9', '这是字幕8 这是字幕9']
+    assert last_slide.slide_layout.name == '空白'
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_subtitles_processor_workers(streaming):
+    output_path = get_output_file_path(f'dest12_{int(streaming)}.pptx')
+    processor = SubtitlesProcessor(
+        output_path=output_path,
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        workers=2,
+    )
+    rows = [{'A': f'这是字幕{i}', 'B': 'B', 'C': 'C'} for i in range(1000)]
+    matched_count, slides_count = processor.append_slides_with_rows(iter(rows))
+    processor.save()
+    assert matched_count == 5000
+    assert slides_count == 1000
+
+    # Chunks rendered by the workers are merged in the order of the rows
+    output_pptx = Presentation(output_path)
+    texts = [slide.shapes[0].table.cell(0, 0).text for slide in list(output_pptx.slides)[6:]]
+    assert texts == [row['A'] for row in rows]
+    # The stage timers of the workers are merged into the stats of the processor
+    assert processor.stats.calls['replace'] == 1000
+
+
+def test_subtitles_processor_spawn():
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest13.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    processor.append_slides_from_file(get_data_file_path('sample1.json'))
+
+    # The spawned processor starts from a pristine copy of the template
+    job = processor.spawn(get_output_file_path('dest14.pptx'))
+    assert job.output_pptx is not processor.output_pptx
+    assert job.placeholder_index is processor.placeholder_index
+    assert len(job.output_pptx.slides) == 7
+    assert job.append_slides_from_file(get_data_file_path('sample3.ndjson')) == (15, 3)
+    job.save()
+    processor.save()
+    assert len(Presentation(job.output_path).slides) == 9
+    assert len(Presentation(processor.output_path).slides) == 9
+
+
+def test_render_batch(tmp_path):
+    from capslide.batch import iter_subtitle_files, render_batch
+
+    manifest_path = tmp_path / 'episodes.lst'
+    manifest_path.write_text(f'{get_data_file_path("sample1.json")}\n\n# comment\n{get_data_file_path("sample3.ndjson")}\n')
+    assert list(iter_subtitle_files(str(manifest_path))) == [get_data_file_path('sample1.json'), get_data_file_path('sample3.ndjson')]
+    assert list(iter_subtitle_files(data_dir)) == [get_data_file_path(name) for name in ('sample1.json', 'sample2.txt', 'sample3.ndjson', 'sample4.srt', 'sample5.vtt', 'sample6.csv')]
+    assert list(iter_subtitle_files(os.path.join(data_dir, '*.json'))) == [get_data_file_path('sample1.json')]
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest15.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    output_dir = os.path.join(outputs_dir, 'batch')
+    results = render_batch(processor, [str(manifest_path), get_data_file_path('missing.json')], output_dir)
+    assert [(os.path.basename(output), matched, slides) for _, output, matched, slides, _ in results] == [
+        ('sample1.pptx', 15, 3), ('sample3.pptx', 15, 3), ('missing.pptx', 0, 0)
+    ]
+    assert results[-1][-1] is not None
+    assert len(Presentation(os.path.join(output_dir, 'sample3.pptx')).slides) == 9
+
+
+def test_template_cache(tmp_path, monkeypatch):
+    from capslide.cache import TemplateCache
+
+    def create_processor():
+        return SubtitlesProcessor(
+            output_path=get_output_file_path('dest16.pptx'),
+            template_path=default_template_path,
+            template_slide_page_number=7,
+            cache_dir=str(tmp_path),
+        )
+
+    processor = create_processor()
+    cache = TemplateCache(str(tmp_path))
+    cache_key = cache.get_key(processor.template_bytes, 7)
+    assert cache.get(cache_key)['placeholders_count'] == 5
+    # An index built with another token pattern is not reused
+    import re
+    import capslide.cache
+    monkeypatch.setattr(capslide.cache, 'PLACEHOLDER_PATTERN', re.compile(r'#(\w+?)#'))
+    assert cache.get_key(processor.template_bytes, 7) != cache_key
+    monkeypatch.undo()
+
+    # A cache hit skips the layout check and the placeholder scan
+    cached_processor = create_processor()
+    assert cached_processor.placeholder_index.dump() == processor.placeholder_index.dump()
+    assert cached_processor.slide_prototype.to_xml() == processor.slide_prototype.to_xml()
+    assert cached_processor.append_slides_from_file(get_data_file_path('sample1.json')) == (15, 3)
+    cached_processor.save()
+
+    # Least recently used entries are evicted beyond the size limit
+    cache.put('other', {'placeholders_count': 1})
+    os.utime(cache.get_entry_path(cache_key), (0, time.time() - 60))
+    TemplateCache(str(tmp_path), max_size=os.path.getsize(cache.get_entry_path('other'))).evict()
+    assert cache.get(cache_key) is None
+    assert cache.get('other') is not None
+    TemplateCache(str(tmp_path), max_age=-1).evict()
+    assert os.listdir(tmp_path) == []
+
+
+def test_render_server(tmp_path):
+    import base64
+    import threading
+    from capslide.server import RenderServer, send_job, get_job_output_path
+
+    socket_path = str(tmp_path / 'capslide.sock')
+    server = RenderServer({'sample': default_template_path}, workers=1, output_dir=outputs_dir)
+    server.bind(socket_path=socket_path)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        rows = [{'A': '这是字幕1', 'B': '这是字幕2', 'C': '这是字幕3'}]
+        response = send_job({'template': 'sample', 'rows': rows}, socket_path=socket_path)
+        assert response['status'] == 'ok'
+        assert (response['matched_count'], response['slides_count']) == (5, 1)
+        output_pptx = Presentation(io.BytesIO(base64.b64decode(response['data'])))
+        assert len(output_pptx.slides) == 7
+
+        output_path = get_output_file_path('dest17.pptx')
+        response = send_job({'template': 'sample', 'template_slide_page_number': 6, 'lines': ['这是字幕1', '', '这是字幕2'], 'output': 'dest17.pptx'}, socket_path=socket_path)
+        assert (response['matched_count'], response['slides_count'], response['output']) == (4, 2, output_path)
+        assert len(Presentation(output_path).slides) == 8
+
+        # Clients cannot write outside the output directory of the server
+        for output in (str(tmp_path / 'dest.pptx'), '../dest.pptx', 'batch/../../dest.pptx'):
+            response = send_job({'template': 'sample', 'rows': rows, 'output': output}, socket_path=socket_path)
+            assert response['status'] == 'error'
+        assert not os.path.exists(tmp_path / 'dest.pptx') and not os.path.exists(os.path.join(base_dir, 'dest.pptx'))
+
+        response = send_job({'template': 'missing', 'rows': rows}, socket_path=socket_path)
+        assert response['status'] == 'error'
+    finally:
+        server.shutdown()
+        thread.join()
+    assert not os.path.exists(socket_path)
+
+    with pytest.raises(CapSlideError):
+        get_job_output_path('dest17.pptx', None)
+
+
+def test_subtitles_processor_incremental(monkeypatch):
+    import zipfile
+
+    output_path = get_output_file_path('dest18.pptx')
+    for path in (output_path, f'{output_path}.manifest.json'):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def render(rows):
+        processor = SubtitlesProcessor(
+            output_path=output_path,
+            template_path=default_template_path,
+            template_slide_page_number=7,
+            incremental=True,
+        )
+        result = processor.append_slides_with_rows(rows)
+        processor.save()
+        return processor, result
+
+    rows = [{'A': f'这是字幕{i}', 'B': 'B', 'C': 'C'} for i in range(4)]
+    processor, result = render(rows)
+    assert result == (20, 4)
+    assert processor.get_slide_manifest().reused_count == 0
+    with zipfile.ZipFile(output_path) as f:
+        first_slide_xml = f.read(processor.get_slide_manifest().slides[0][1])
+
+    # The previous deck is closed before the new one replaces it, which Windows requires
+    replace = os.replace
+    closed_on_replace = []
+    def checked_replace(src, dst):
+        if dst == output_path:
+            closed_on_replace.append(processor.get_slide_manifest().previous_zip is None)
+        replace(src, dst)
+    monkeypatch.setattr(os, 'replace', checked_replace)
+    processor = SubtitlesProcessor(
+        output_path=output_path,
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        incremental=True,
+    )
+    processor.append_slides_with_rows(rows)
+    assert processor.get_slide_manifest().previous_zip is not None
+    processor.save()
+    assert closed_on_replace == [True]
+    monkeypatch.undo()
+
+    # Change one row, remove one and add one
+    rows[1] = {'A': '改过的字幕', 'B': 'B', 'C': 'C'}
+    del rows[2]
+    rows.append({'A': '新的字幕', 'B': 'B', 'C': 'C'})
+    processor, result = render(rows)
+    assert result == (20, 4)
+    assert processor.get_slide_manifest().reused_count == 2
+    with zipfile.ZipFile(output_path) as f:
+        assert f.read(processor.get_slide_manifest().slides[0][1]) == first_slide_xml
+
+    output_pptx = Presentation(output_path)
+    texts = [slide.shapes[0].table.cell(0, 0).text for slide in list(output_pptx.slides)[6:]]
+    assert texts == [row['A'] for row in rows]
+
+
+def test_subtitles_processor_stats(capsys):
+    from capslide.stats import ProgressReporter
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest19.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    stages = []
+    processor.stats.add_hook(lambda stage, seconds: stages.append(stage))
+    capsys.readouterr()
+
+    rows = [{'A': f'这是字幕{i}', 'B': 'B', 'C': 'C'} for i in range(50)]
+    assert processor.append_slides_with_rows(rows) == (250, 50)
+    processor.save()
+
+    # Progress is throttled, not printed for every page
+    assert len(capsys.readouterr().out.splitlines()) < 10
+    stats = processor.stats.as_dict()
+    assert stats['counters'] == {'rows': 50, 'pages': 50, 'placeholders': 250}
+    assert stats['timers']['load']['calls'] == 1
+    assert stats['timers']['clone']['calls'] == stats['timers']['replace']['calls'] == 50
+    assert stats['timers']['save']['calls'] == 1
+    assert stages.count('replace') == 50 and stages[-1] == 'save'
+
+    reporter = ProgressReporter(interval=0)
+    reporter.update(1, 5, 5)
+    assert capsys.readouterr().out == 'Successfully added page 1! 5 subtitle(s) inserted.\n'
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_subtitles_processor_prune(streaming):
+    import zipfile
+
+    output_path = get_output_file_path(f'dest20_{int(streaming)}.pptx')
+    processor = SubtitlesProcessor(
+        output_path=output_path,
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        prune=True,
+    )
+    processor.append_slides_from_file(get_data_file_path('sample1.json'))
+    processor.save()
+
+    # Only the generated slides and the layout they use are left
+    output_pptx = Presentation(output_path)
+    assert len(output_pptx.slides) == 3
+    assert [layout.name for layout in output_pptx.slide_layouts] == ['空白']
+    assert output_pptx.slides[0].shapes[0].table.cell(0, 0).text == '这是字幕A1'
+
+    with zipfile.ZipFile(output_path) as f:
+        names = f.namelist()
+    assert len([name for name in names if name.startswith('ppt/slides/slide')]) == 3
+    assert len([name for name in names if name.startswith('ppt/slideLayouts/slideLayout')]) == 1
+    assert not [name for name in names if name.startswith('ppt/notesSlides/')]
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_duplicate_slide_pictures(tmp_path, streaming):
+    import zipfile
+    from PIL import Image
+    from pptx.util import Inches
+
+    # The template slide shows a logo, which every generated slide shares
+    logo_path = tmp_path / 'logo.png'
+    Image.new('RGB', (64, 64), 'red').save(logo_path)
+    template_pptx = Presentation(default_template_path)
+    template_pptx.slides[6].shapes.add_picture(str(logo_path), Inches(0.2), Inches(0.2))
+    template_path = str(tmp_path / 'logo.pptx')
+    template_pptx.save(template_path)
+
+    processor = SubtitlesProcessor(
+        output_path=str(tmp_path / 'dest.pptx'),
+        template_path=template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        prune=True,
+    )
+    job = processor.spawn(str(tmp_path / 'dest21.pptx'))
+    rows = [{'A': f'这是字幕{i}', 'B': 'B', 'C': 'C'} for i in range(20)]
+    assert job.append_slides_with_rows(rows) == (100, 20)
+    job.save()
+
+    output_pptx = Presentation(job.output_path)
+    assert len(output_pptx.slides) == 20
+    for slide in output_pptx.slides:
+        assert slide.shapes[-1].image.size == (64, 64)
+    with zipfile.ZipFile(job.output_path) as f:
+        assert len([name for name in f.namelist() if name.startswith('ppt/media/')]) == 1
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+@pytest.mark.parametrize('compression', ['deflate', 'stored'])
+def test_subtitles_processor_save_stream(streaming, compression, capsys):
+    import zipfile
+
+    output = io.BytesIO()
+    processor = SubtitlesProcessor(
+        output_path=output,
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        compression=compression,
+        compress_level=1,
+        save_workers=2,
+    )
+    assert processor.append_slides_from_file(get_data_file_path('sample1.json')) == (15, 3)
+    processor.save()
+    assert 'File saved to an in-memory stream' in capsys.readouterr().out
+
+    with zipfile.ZipFile(io.BytesIO(output.getvalue())) as f:
+        assert f.testzip() is None
+        # Media such as the thumbnail are stored either way
+        compress_types = set(info.compress_type for info in f.infolist() if info.filename.endswith('.xml'))
+    assert compress_types == {zipfile.ZIP_DEFLATED if compression == 'deflate' else zipfile.ZIP_STORED}
+    output_pptx = Presentation(io.BytesIO(output.getvalue()))
+    assert len(output_pptx.slides) == 6 + 3
+
+
+def test_package_zip_writer_zip64(monkeypatch):
+    import zipfile
+    from capslide import zipwriter
+
+    # Pretend every size and offset overflows the classic zip fields
+    monkeypatch.setattr(zipwriter, 'ZIP64_LIMIT', 0)
+    monkeypatch.setattr(zipwriter, 'ZIP64_COUNT_LIMIT', 0)
+    monkeypatch.setattr(zipwriter, 'PARALLEL_MIN_SIZE', 0)
+    output = io.BytesIO()
+    entries = {f'ppt/part{i}.xml': f'<part>{i}</part>'.encode('utf-8') * (i + 1) for i in range(20)}
+    with zipwriter.PackageZipWriter(output, workers=2) as writer:
+        for name, data in entries.items():
+            writer.writestr(name, data)
+
+    with zipfile.ZipFile(output) as f:
+        assert f.namelist() == list(entries)
+        assert all(f.read(name) == data for name, data in entries.items())
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_subtitles_processor_max_slides_per_file(tmp_path, streaming):
+    processor = SubtitlesProcessor(
+        output_path=str(tmp_path / 'dest.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        prune=True,
+        max_slides_per_file=4,
+    )
+    rows = [{'A': f'这是字幕{i}', 'B': 'B', 'C': 'C'} for i in range(10)]
+    assert processor.append_slides_with_rows(rows) == (50, 10)
+    processor.save()
+
+    # Full files are saved as soon as the next slide comes in, the last one holds the rest
+    assert processor.output_paths == [str(tmp_path / f'dest_00{i}.pptx') for i in (1, 2, 3)]
+    texts = []
+    for output_path in processor.output_paths:
+        output_pptx = Presentation(output_path)
+        texts.append([slide.shapes[0].table.cell(0, 0).text for slide in output_pptx.slides])
+    assert texts == [[row['A'] for row in rows[i:i + 4]] for i in (0, 4, 8)]
+
+
+@pytest.mark.parametrize('options', [{'max_slides_per_file': 0}, {'max_slides_per_file': -1}, {'compress_level': 12}])
+def test_subtitles_processor_invalid_save_options(tmp_path, options, capsys):
+    from capslide.cli import main
+    from capslide.zipwriter import PackageZipWriter
+
+    # Save options fail before any slide is generated
+    with pytest.raises(CapSlideError):
+        SubtitlesProcessor(
+            output_path=str(tmp_path / 'dest.pptx'),
+            template_path=default_template_path,
+            template_slide_page_number=7,
+            **options
+        )
+    name, value = next(iter(options.items()))
+    with pytest.raises(SystemExit):
+        main([get_data_file_path('sample1.json'), '-t', default_template_path, f'--{name}', str(value)])
+    assert f'--{name}' in capsys.readouterr().err
+    if name == 'compress_level':
+        with pytest.raises(ValueError):
+            PackageZipWriter(io.BytesIO(), compress_level=value)
+
+
+def test_preprocessors_readers():
+    from preprocessors import get_reader, read_srt_rows, read_vtt_rows, read_csv_rows
+
+    assert get_reader('episode.SRT') is read_srt_rows
+    assert get_reader('episode.doc') is None
+    assert list(read_srt_rows(get_data_file_path('sample4.srt'), 'subtitle')) == [
+        {'subtitle': '这是字幕1', 'index': '1', 'start': '00:00:01,000', 'end': '00:00:02,500'},
+        {'subtitle': '这是字幕2 第二行', 'index': '2', 'start': '00:00:03,000', 'end': '00:00:04,000'},
+        {'subtitle': '这是字幕3', 'index': '3', 'start': '00:00:05,000', 'end': '00:00:06,000'},
+    ]
+    assert list(read_vtt_rows(get_data_file_path('sample5.vtt'), 'subtitle')) == [
+        {'subtitle': '这是字幕1', 'index': 'intro', 'start': '00:00:01.000', 'end': '00:00:02.500', 'speaker': '主持人'},
+        {'subtitle': '这是字幕2', 'index': '', 'start': '00:00:03.000', 'end': '00:00:04.000', 'speaker': ''},
+    ]
+    assert list(read_csv_rows(get_data_file_path('sample6.csv'), 'subtitle'))[1] == {'A': '这是字幕A4', 'B': '这是字幕5, 逗号', 'C': '这是字幕6'}
+
+
+@pytest.mark.parametrize('filename, template_slide_page_number, expected', [
+    ('sample4.srt', 6, (6, 3)),
+    ('sample5.vtt', 6, (4, 2)),
+    ('sample6.csv', 7, (10, 2)),
+])
+def test_subtitles_processor_reader_files(filename, template_slide_page_number, expected):
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest22.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=template_slide_page_number,
+    )
+    assert processor.append_slides_from_file(get_data_file_path(filename)) == expected
+
+
+def test_text_normalizer():
+    from capslide.normalize import TextNormalizer
+
+    normalizer = TextNormalizer(strip_punctuation=True, half_width=True, collapse_whitespace=True, max_length=8)
+    assert normalizer('　ＡＢＣ，你好！ ') == 'ABC你好'
+    assert normalizer('这是  一段很长的字幕。') == '这是 一段很长…'
+    assert normalizer(42) == '42'
+    # Repeated lines are served from the memo
+    normalizer('[Music]')
+    normalizer('[Music]')
+    assert normalizer.normalize.cache_info().hits >= 1
+    assert TextNormalizer()('原样，保留！') == '原样，保留！'
+    assert TextNormalizer()(None) == ''
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest23.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        ignore_masks=True,
+        half_width=True,
+    )
+    assert processor.normalize_row({'A': 'Ａ，１', 'B': 2, 'C': None}) == {'A': 'A1', 'B': '2', 'C': ''}
+
+    # Subclasses choose the stripped marks through punctuation_masks, worker processes strip the same ones
+    class HashtagProcessor(SubtitlesProcessor):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.punctuation_masks = self.punctuation_masks - {'!'} | {'#'}
+
+    processor = HashtagProcessor(
+        output_path=get_output_file_path('dest23.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        ignore_masks=True,
+    )
+    assert processor.normalize_row({'A': '#字幕!。'}) == {'A': '字幕!'}
+    assert processor.get_worker_options()['punctuation_masks'] == ''.join(sorted(processor.punctuation_masks))
+
+
+def test_replace_placeholders_of_slide():
+    from capslide.placeholders import get_placeholders_pattern, substitute_placeholders
+
+    # Longer names win over their prefixes, values are not scanned again
+    pattern = get_placeholders_pattern(('A', 'AB', 'B'))
+    assert pattern is get_placeholders_pattern(('A', 'AB', 'B'))
+    assert substitute_placeholders('#AB##A# #A# #C#', {'A': '#B#', 'AB': 'x', 'B': 'y'}, pattern) == ('x#B# #B# #C#', 2)
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest24.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    new_slide = processor.duplicate_slide(processor.template_slide)
+    row = {f'key{i}': str(i) for i in range(30)}
+    row.update({'A': '这是字幕A1', 'B': '这是字幕2', 'C': '这是字幕3'})
+    assert processor.replace_placeholders_of_slide(new_slide, row) == 5
+    assert [table_row.cells[0].text for table_row in new_slide.shapes[0].table.rows] == ['这是字幕A1', '这是字幕2这是字幕3', '这是字幕2 这是字幕3']
+
+
+@pytest.mark.parametrize('streaming, workers', [(False, 1), (True, 1), (False, 2)])
+def test_subtitles_processor_template_routing(streaming, workers):
+    output_path = get_output_file_path(f'dest25_{int(streaming)}{workers}.pptx')
+    processor = SubtitlesProcessor(
+        output_path=output_path,
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        workers=workers,
+    )
+    rows = [
+        {'_template': 6, 'subtitle': '第一集'},
+        {'A': '这是字幕A1', 'B': '这是字幕2', 'C': '这是字幕3'},
+        {'_template': '4', 'A': '这是字幕A4', 'B': '这是字幕5', 'C': '这是字幕6'},
+        # Blank cells of a _template column keep the default template slide
+        {'_template': '', 'A': '这是字幕A7', 'B': '这是字幕8', 'C': '这是字幕9'},
+    ]
+    assert processor.append_slides_with_rows(rows) == (2 + 5 + 3 + 5, 4)
+    if workers == 1:
+        # Every template slide is prepared once, whatever the number of rows using it
+        assert sorted(processor._template_slides) == [4, 6, 7]
+        assert processor.get_template_slide(6) is processor.get_template_slide(6)
+    processor.save()
+
+    # The used template slides 4, 6 and 7 are removed
+    output_pptx = Presentation(output_path)
+    slides = list(output_pptx.slides)
+    assert len(slides) == 4 + 4
+    generated = slides[4:]
+    assert [cell.text for row in generated[0].shapes[0].table.rows for cell in row.cells] == ['第一集', '', '第一集']
+    assert generated[1].shapes[0].table.cell(0, 0).text == '这是字幕A1'
+    assert [cell.text for row in generated[2].shapes[0].table.rows for cell in row.cells] == ['这是字幕A4', '这是字幕5', '这是字幕6']
+    assert generated[3].shapes[0].table.cell(0, 0).text == '这是字幕A7'
+
+    with pytest.raises(SubtitlesTemplateSlideMasterError):
+        processor.append_slide_with_row({'_template': 1, 'subtitle': '标题'})
+    for page_number in (2.7, True, 'x', '4.5'):
+        with pytest.raises(CapSlideError):
+            processor.get_row_template_slide({'_template': page_number})
+    assert processor.get_row_template_slide({'_template': 4.0}).page_number == 4
+
+
+def test_inspect_template(tmp_path):
+    import subprocess
+    import sys
+    from capslide.inspection import inspect_template
+
+    slides = inspect_template(default_template_path)
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest26.pptx'),
+        template_path=default_template_path,
+    )
+    # Same counts as the processor gets from the python-pptx object model
+    assert [len(slide['placeholders']) for slide in slides] == [
+        processor.get_placeholders_count(slide) for slide in processor.template_pptx.slides
+    ]
+    assert [slide['usable'] for slide in slides] == [False, False, True, True, True, True, True]
+    assert slides[0]['layout'] == '标题幻灯片'
+
+    # Placeholders within groups are not filled, a slide holding only those cannot be used
+    template_pptx = Presentation(default_template_path)
+    slide = template_pptx.slides.add_slide(template_pptx.slide_layouts.get_by_name('空白'))
+    group = slide.shapes.add_group_shape()
+    group.shapes.add_textbox(0, 0, 914400, 914400).text_frame.text = '#A#'
+    template_path = str(tmp_path / 'group.pptx')
+    template_pptx.save(template_path)
+    assert inspect_template(template_path)[-1] == {'layout': '空白', 'placeholders': [], 'usable': False, 'page_number': 8}
+    with pytest.raises(SubtitlesTemplatePlaceholderError):
+        SubtitlesProcessor(output_path=get_output_file_path('dest26.pptx'), template_path=template_path)
+
+    # The CLI only loads python-pptx when it generates a deck
+    code = 'import sys, capslide, capslide.cli; assert "pptx" not in sys.modules; capslide.SubtitlesProcessor; assert "pptx" in sys.modules'
+    subprocess.run([sys.executable, '-c', code], check=True, cwd=os.path.dirname(base_dir))
+
+
+def test_row_store():
+    import pickle
+    from capslide.rows import RowStore
+
+    rows = [{'A': '这是字幕A1', 'B': '这是字幕2'}, {'A': '这是字幕A4', 'C': '这是字幕6'}]
+    store = RowStore.from_rows(rows)
+    assert store.names == ['A', 'B', 'C']
+    assert [dict(row) for row in store] == rows
+    assert 'B' not in store[1] and store[1].get('B') is None and store[-1]['C'] == '这是字幕6'
+    # Rows cross process boundaries as plain dicts
+    assert pickle.loads(pickle.dumps(store[0])) == rows[0]
+    with pytest.raises(ValueError):
+        RowStore.from_columns({'A': ['1', '2'], 'B': ['1']})
+    # Appending to a store built from columns leaves the columns of the caller untouched
+    column = ['1', '2']
+    store = RowStore.from_columns({'A': column, 'B': ('3', '4'), 'C': range(2)})
+    store.append({'A': '5', 'D': '6'})
+    assert column == ['1', '2']
+    assert [dict(row) for row in store] == [{'A': '1', 'B': '3', 'C': 0}, {'A': '2', 'B': '4', 'C': 1}, {'A': '5', 'D': '6'}]
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest27.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    columns = {'A': [f'这是字幕{i}' for i in range(100)], 'B': ['B'] * 100, 'C': ['C'] * 100}
+    assert processor.append_slides_with_columns(columns) == (500, 100)
+    processor.save()
+    output_pptx = Presentation(processor.output_path)
+    assert [slide.shapes[0].table.cell(0, 0).text for slide in list(output_pptx.slides)[6:]] == columns['A']
+
+
+def test_subtitles_processor_async_rows():
+    import asyncio
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest28.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    checkpoint_path = get_output_file_path('dest28_checkpoint.pptx')
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    async def feed(count):
+        for i in range(count):
+            if i % 10 == 0:
+                await asyncio.sleep(0)
+            yield {'A': f'这是字幕{i}', 'B': 'B', 'C': 'C'}
+
+    async def generate():
+        counts = await processor.append_slides_with_async_rows(
+            feed(50), queue_size=4, batch_size=8, checkpoint_interval=0, checkpoint_path=checkpoint_path
+        )
+        # The deck is left as it was, slides can still be added after a checkpoint
+        processor.save_checkpoint(checkpoint_path)
+        return counts
+    assert asyncio.run(generate()) == (250, 50)
+
+    checkpoint_pptx = Presentation(checkpoint_path)
+    assert len(checkpoint_pptx.slides) == 6 + 50
+    assert checkpoint_pptx.slides[-1].shapes[0].table.cell(0, 0).text == '这是字幕49'
+    processor.save()
+    assert len(Presentation(processor.output_path).slides) == 6 + 50
+
+    async def broken_feed():
+        yield {'A': 'A'}
+        raise ValueError('feed closed')
+    with pytest.raises(ValueError):
+        asyncio.run(processor.append_slides_with_async_rows(broken_feed()))
+
+    streaming_processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest28.pptx'),
+        template_path=default_template_path,
+        streaming=True,
+    )
+    with pytest.raises(CapSlideError):
+        streaming_processor.save_checkpoint()
+    # Impossible checkpoints fail before any row of the feed is read
+    rows = [{'subtitle': '这是字幕'}]
+    async def live_feed():
+        while rows:
+            yield rows.pop()
+    with pytest.raises(CapSlideError):
+        asyncio.run(streaming_processor.append_slides_with_async_rows(live_feed(), checkpoint_interval=1))
+    assert len(rows) == 1
+
+
+@pytest.mark.parametrize('streaming', [False, True])
+def test_subtitles_processor_autofit(streaming):
+    from pptx.util import Pt
+    from pptx.oxml.ns import qn
+    from capslide.autofit import TextFitter, FitTarget, GlyphWidths, get_effective_font_size, get_fit_target
+
+    fitter = TextFitter()
+    target = FitTarget(None, Pt(40), Pt(400), Pt(100))
+    assert fitter.fit('Hello', target) == Pt(40)
+    sizes = [fitter.fit('这是字幕' * count, target) for count in (5, 10, 20, 40)]
+    assert sizes == sorted(sizes, reverse=True) and sizes[-1] < Pt(40)
+    assert fitter.fit('这是字幕' * 1000, target) == Pt(8)
+    # Fonts measured with PIL are read once per character
+    class Font:
+        calls = 0
+        def getlength(self, text):
+            Font.calls += 1
+            return 50.0
+    glyph_widths = GlyphWidths(Font())
+    assert glyph_widths.measure('abab') == 2.0 and Font.calls == 2
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path(f'dest29_{int(streaming)}.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        autofit=True,
+    )
+    processor.append_slides_with_rows([
+        {'A': '这是字幕', 'B': 'B', 'C': 'C'},
+        {'A': '这是一条非常长的字幕' * 8, 'B': 'B', 'C': 'C'},
+    ])
+    processor.save()
+    short_slide, long_slide = list(Presentation(processor.output_path).slides)[-2:]
+    short_size = short_slide.shapes[0].table.cell(0, 0).text_frame.paragraphs[0].runs[0].font.size
+    long_size = long_slide.shapes[0].table.cell(0, 0).text_frame.paragraphs[0].runs[0].font.size
+    assert long_size < short_size <= Pt(60)
+
+    # The slide-wide replacement fits its runs the same way
+    if not streaming:
+        new_slide = processor.duplicate_slide(processor.template_slide)
+        processor.replace_placeholders_of_slide(new_slide, {'A': '这是一条非常长的字幕' * 8})
+        assert new_slide.shapes[0].table.cell(0, 0).text_frame.paragraphs[0].runs[0].font.size == long_size
+
+    # Runs without a size of their own are fitted from the size they inherit, 18 pt on slide 4
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path(f'dest29_{int(streaming)}.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=4,
+        streaming=streaming,
+        autofit=True,
+    )
+    processor.append_slides_with_rows([{'A': 'A', 'B': '这是一条非常长的字幕' * 4, 'C': 'C'}])
+    processor.save()
+    cells = [table_row.cells[0] for table_row in list(Presentation(processor.output_path).slides)[-1].shapes[0].table.rows]
+    assert cells[0].text_frame.paragraphs[0].runs[0].font.size is None
+    assert cells[1].text_frame.paragraphs[0].runs[0].font.size < Pt(18)
+
+    # Nothing is written when the inherited size cannot be resolved
+    template_pptx = Presentation(default_template_path)
+    default_text_style = template_pptx.part._element.find(qn('p:defaultTextStyle'))
+    default_text_style.getparent().remove(default_text_style)
+    cell = template_pptx.slides[3].shapes[0].table.cell(0, 0)
+    paragraph = cell.text_frame.paragraphs[0]
+    assert get_effective_font_size(paragraph.runs[0], paragraph, cell.text_frame, cell) is None
+    assert get_fit_target(paragraph.runs[0], paragraph, cell, (Pt(100), Pt(100))) is None
+
+
+def test_render_batch_output_names(tmp_path):
+    from capslide.batch import get_batch_output_paths, render_batch
+
+    output_dir = str(tmp_path / 'decks')
+    paths = ['/data/ep1.srt', '/data/ep1.vtt', '/data/ep2.json', '/data/season1/ep3.json', '/data/season2/EP3.json']
+    assert [os.path.relpath(path, output_dir) for path in get_batch_output_paths(paths, output_dir)] == [
+        'ep1.srt.pptx', 'ep1.vtt.pptx', 'ep2.pptx', os.path.join('season1', 'ep3.json.pptx'), os.path.join('season2', 'EP3.json.pptx')
+    ]
+
+    source_dir = tmp_path / 'subtitles'
+    source_dir.mkdir()
+    (source_dir / 'ep1.json').write_text(open(get_data_file_path('sample1.json'), encoding='utf-8').read(), encoding='utf-8')
+    (source_dir / 'ep1.txt').write_text('字幕1\n字幕2\n', encoding='utf-8')
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path('dest15.pptx'),
+        template_path=default_template_path,
+        template_slide_page_number=7,
+    )
+    results = render_batch(processor, [str(source_dir), str(source_dir / 'ep1.json')], output_dir)
+    assert [os.path.basename(output) for _, output, _, _, error in results if error is None] == ['ep1.json.pptx', 'ep1.txt.pptx']
+    assert all(os.path.exists(output) for _, output, _, _, _ in results)
+
+
+@pytest.mark.parametrize('streaming, prune', [(False, False), (True, False), (False, True), (True, True)])
+def test_subtitles_processor_template_layouts(tmp_path, streaming, prune):
+    import copy
+    from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+    from pptx.opc.packuri import PackURI
+    from pptx.parts.slide import SlideLayoutPart
+
+    # Slide 7 moves to a copy of the blank layout named Blank, which a lookup by name finds first
+    template_pptx = Presentation(default_template_path)
+    blank_layout = template_pptx.slide_layouts.get_by_name('空白')
+    master_part = template_pptx.slide_masters[0].part
+    layout_part = SlideLayoutPart(
+        PackURI('/ppt/slideLayouts/slideLayout99.xml'), blank_layout.part.content_type,
+        template_pptx.part.package, copy.deepcopy(blank_layout._element)
+    )
+    layout_part.slide_layout.name = 'Blank'
+    layout_part.relate_to(master_part, RT.SLIDE_MASTER)
+    sld_layout_id_lst = template_pptx.slide_masters[0].slide_layouts._sldLayoutIdLst
+    sld_layout_id_lst._add_sldLayoutId(
+        id=max(int(sld_layout_id.get('id')) for sld_layout_id in sld_layout_id_lst) + 1,
+        rId=master_part.relate_to(layout_part, RT.SLIDE_LAYOUT)
+    )
+    slide_part = template_pptx.slides[6].part
+    slide_part.drop_rel(next(rId for rId, rel in slide_part.rels.items() if rel.reltype == RT.SLIDE_LAYOUT))
+    slide_part.relate_to(layout_part, RT.SLIDE_LAYOUT)
+    template_path = str(tmp_path / 'layouts.pptx')
+    template_pptx.save(template_path)
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path(f'dest30_{int(streaming)}{int(prune)}.pptx'),
+        template_path=template_path,
+        template_slide_page_number=6,
+        streaming=streaming,
+        prune=prune,
+    )
+    processor.append_slides_with_rows([
+        {'subtitle': '这是字幕1'},
+        {'_template': 7, 'A': '这是字幕A', 'B': 'B', 'C': 'C'},
+    ])
+    processor.save()
+    output_pptx = Presentation(processor.output_path)
+    assert [slide.slide_layout.name for slide in list(output_pptx.slides)[-2:]] == ['空白', 'Blank']
+    # The layouts of the generated slides are listed by their master, pruned or not
+    for slide in output_pptx.slides:
+        assert slide.slide_layout in list(slide.slide_layout.slide_master.slide_layouts)
+
+
+@pytest.mark.parametrize('streaming, workers', [(False, 1), (True, 1), (False, 2)])
+def test_subtitles_processor_placeholder_names(tmp_path, streaming, workers):
+    template_pptx = Presentation(default_template_path)
+    table = template_pptx.slides[6].shapes[0].table
+    table.cell(0, 0).text_frame.paragraphs[0].runs[0].text = '#speaker-name#'
+    table.cell(1, 0).text_frame.paragraphs[0].runs[0].text = '#first name#: #B# #C'
+    template_path = str(tmp_path / 'names.pptx')
+    template_pptx.save(template_path)
+
+    processor = SubtitlesProcessor(
+        output_path=get_output_file_path(f'dest31_{int(streaming)}{workers}.pptx'),
+        template_path=template_path,
+        template_slide_page_number=7,
+        streaming=streaming,
+        workers=workers,
+    )
+    assert processor.placeholder_index.names == ('speaker-name', 'first name', 'B', 'C')
+    row = {'speaker-name': '主持人', 'first name': '小明', 'B': '这是字幕2', 'C': '这是字幕3'}
+    assert processor.append_slides_with_rows([row]) == (5, 1)
+    processor.save()
+    table = Presentation(processor.output_path).slides[-1].shapes[0].table
+    assert [table.cell(i, 0).text for i in range(3)] == ['主持人', '小明: 这是字幕2 #C', '这是字幕2 这是字幕3']
+
+    # The slide-wide replacement fills the same tokens
+    if not streaming:
+        new_slide = processor.duplicate_slide(processor.template_slide)
+        assert processor.replace_placeholders_of_slide(new_slide, row) == 5